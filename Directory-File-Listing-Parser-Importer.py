@@ -12,15 +12,34 @@ Description:    This is a Burp Suite extension in Python to parse a directory an
                 a proper response will be checked for before adding the request/response pair to Burp's Target Site Map.
 """
 
-from javax.swing import BorderFactory, ButtonGroup, JButton, JComboBox, \
-JFileChooser, JFrame, JLabel, JOptionPane, JPanel, JRadioButton, JScrollPane, JTextArea, JTextField
+from javax.swing import AbstractListModel, BorderFactory, ButtonGroup, JButton, JCheckBox, JComboBox, \
+JFileChooser, JFrame, JLabel, JList, JOptionPane, JPanel, JProgressBar, JRadioButton, JScrollPane, JTextArea, JTextField, SwingUtilities
 from javax.swing.filechooser import FileNameExtensionFilter
-from java.awt import BorderLayout, Dimension, Font, GridLayout
-import os, shlex
+from java.awt import BorderLayout, Dimension, Font, GridLayout, Toolkit
+from java.awt.datatransfer import StringSelection
+import json, os, sys, threading, time, traceback
 from burp import IBurpExtender, IContextMenuFactory
 from java.net import URL
 from javax.swing import JMenuItem
-from urllib2 import urlopen
+from urllib2 import HTTPError, Request, urlopen
+
+# Make the helper modules shipped next to this file importable when Burp has not been given a module folder
+try:
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+except NameError:
+    pass
+from listing_files import LISTING_EXTENSIONS
+from listing_parser import DEFAULT_DIR_PREFIX, LISTING_TYPES, ListingParser, ListingParserError
+from metrics import Metrics
+from path_store import DIRECTORY
+from probe_cache import ProbeCache
+from probe_engine import ProbeCancelled, ProbeEngine
+from probe_journal import ProbeJournal
+from probe_scheduler import TreeScheduler, parseStatuses
+from url_filter import DEFAULT_RULES, UrlFilter, parseRules
+
+# Request methods for files over the light probe size, as (label, method).  'RANGE' is a GET for the first byte only
+LIGHT_PROBE_METHODS = (('HEAD', 'HEAD'), ('GET first byte', 'RANGE'))
 
 
 class BurpExtender(IBurpExtender, IContextMenuFactory):
@@ -80,9 +99,15 @@ class BurpExtender(IBurpExtender, IContextMenuFactory):
         self.SSL = 'http://'
         self.listType = ''
         self.parsedList = []
+        self.engine = None
+        self.parseMetrics = None
+        self.importMetrics = None
+        self.parseCancelled = False
+        self.parseFailed = False
+        self.filterRules = DEFAULT_RULES
 
         # Set up main window (JFrame)
-        self.window = JFrame("Directory Listing Parser for Burp Suite", preferredSize=(600, 475), windowClosing=self.closeUI)
+        self.window = JFrame("Directory Listing Parser for Burp Suite", preferredSize=(600, 760), windowClosing=self.closeUI)
         self.window.setDefaultCloseOperation(JFrame.DO_NOTHING_ON_CLOSE)
         emptyBorder = BorderFactory.createEmptyBorder(10, 10, 10, 10)
         self.window.contentPane.setBorder(emptyBorder)
@@ -99,7 +124,8 @@ class BurpExtender(IBurpExtender, IContextMenuFactory):
 
         # Left panel for user input, consisting of hostname, directory prefix, ssl, port, type of listing, and file
         self.leftPanel = JPanel()
-        self.leftPanel.layout = GridLayout(14, 1, 3, 3)
+        # One column with as many rows as there are components, so adding a field cannot spill the form into a second column
+        self.leftPanel.layout = GridLayout(0, 1, 3, 3)
         hostnameLabel = JLabel("Hostname:")
 
         if self.originalMsgHost:
@@ -108,7 +134,7 @@ class BurpExtender(IBurpExtender, IContextMenuFactory):
             self.hostnameTextField = JTextField('Hostname')
 
         dirPrefixLabel = JLabel("Full Directory Prefix (Windows):")
-        self.dirPrefixField = JTextField('C:\\var\www\\')
+        self.dirPrefixField = JTextField(DEFAULT_DIR_PREFIX)
         
         sslLabel = JLabel("SSL:")
         self.radioBtnSslEnabled = JRadioButton('Enabled (https)', actionPerformed=self.radioSsl)
@@ -130,11 +156,49 @@ class BurpExtender(IBurpExtender, IContextMenuFactory):
             self.portTextField = JTextField('80')
 
         osLabel = JLabel("Type of File Listing:")
-        self.types = ('Windows \'dir /s\'', 'Linux \'ls -lR\'', 'Linux \'ls -R\'')
+        self.types = tuple([label for name, label in LISTING_TYPES])
         self.comboListingType = JComboBox(self.types)
-        uploadLabel = JLabel("Directory Listing File:")
+        uploadLabel = JLabel("Directory Listing File(s):")
         self.uploadTextField = JTextField('')
         uploadButton = JButton('Choose File', actionPerformed=self.chooseFile)
+        filterButton = JButton('Filter Rules...', actionPerformed=self.editFilterRules)
+
+        # Import tuning: number of concurrent requests, maximum requests per second to one host (0 for no limit) and request timeout
+        probeLabel = JLabel("Threads / Max Req/s per Host / Timeout (s):")
+        probePanel = JPanel(GridLayout(1, 3, 3, 3))
+        self.threadsTextField = JTextField('8')
+        self.rateTextField = JTextField('0')
+        self.timeoutTextField = JTextField('10')
+        probePanel.add(self.threadsTextField)
+        probePanel.add(self.rateTextField)
+        probePanel.add(self.timeoutTextField)
+        # Read the status from the single Burp request instead of checking each URL with urlopen first
+        self.singleRequestCheckBox = JCheckBox('Single request per URL (via Burp)', True)
+        # Journal of probed URLs, so an interrupted import can skip what was already done.  Left empty, a file per host and port is used
+        self.resumeCheckBox = JCheckBox('Resume from import journal:', True)
+        self.journalTextField = JTextField('')
+        # URLs are probed one directory level at a time.  Below a directory answering with one of these status codes only the given number of samples is probed
+        pruneLabel = JLabel("Prune Below Status Codes / Samples:")
+        prunePanel = JPanel(GridLayout(1, 2, 3, 3))
+        self.pruneTextField = JTextField('404')
+        self.sampleTextField = JTextField('0')
+        prunePanel.add(self.pruneTextField)
+        prunePanel.add(self.sampleTextField)
+        # Files the listing gives as larger than this many bytes are only probed with HEAD or a one byte range, leave empty to always fetch whole files
+        lightProbeLabel = JLabel("Light Probe Above (bytes) / Method:")
+        lightProbePanel = JPanel(GridLayout(1, 2, 3, 3))
+        self.lightSizeTextField = JTextField('1048576')
+        self.comboLightMethod = JComboBox(tuple([label for label, method in LIGHT_PROBE_METHODS]))
+        lightProbePanel.add(self.lightSizeTextField)
+        lightProbePanel.add(self.comboLightMethod)
+        self.fullFetchCheckBox = JCheckBox('Fetch whole file for site map after light probe', False)
+        # Probe results cached across imports in ~/.listing-import/probe-cache.tsv.  Older entries are revalidated, 0 entries turns the cache off
+        cacheLabel = JLabel("Probe Cache TTL (hours) / Max Entries:")
+        cachePanel = JPanel(GridLayout(1, 2, 3, 3))
+        self.cacheTtlTextField = JTextField('24')
+        self.cacheSizeTextField = JTextField('1000000')
+        cachePanel.add(self.cacheTtlTextField)
+        cachePanel.add(self.cacheSizeTextField)
 
         self.leftPanel.add(hostnameLabel)
         self.leftPanel.add(self.hostnameTextField)
@@ -150,33 +214,78 @@ class BurpExtender(IBurpExtender, IContextMenuFactory):
         self.leftPanel.add(uploadLabel)
         self.leftPanel.add(self.uploadTextField)
         self.leftPanel.add(uploadButton)
-
-        # Right panel consisting of a text area for the URL list
+        self.leftPanel.add(filterButton)
+        self.leftPanel.add(probeLabel)
+        self.leftPanel.add(probePanel)
+        self.leftPanel.add(self.singleRequestCheckBox)
+        self.leftPanel.add(self.resumeCheckBox)
+        self.leftPanel.add(self.journalTextField)
+        self.leftPanel.add(pruneLabel)
+        self.leftPanel.add(prunePanel)
+        self.leftPanel.add(lightProbeLabel)
+        self.leftPanel.add(lightProbePanel)
+        self.leftPanel.add(self.fullFetchCheckBox)
+        self.leftPanel.add(cacheLabel)
+        self.leftPanel.add(cachePanel)
+
+        # Right panel consisting of a small text area for cookies and results above a list view of the URLs
         self.UrlPanelLabel = JLabel("URL List:")
-        self.textArea = JTextArea()
-        self.textArea.setEditable(True)
-        self.textArea.setFont(Font("Default", Font.PLAIN, 14))
+        self.textArea = JTextArea(4, 30)
+        self.textArea.setEditable(False)
+        self.textArea.setFont(Font("Default", Font.PLAIN, 12))
         if self.cookies:
             self.textArea.append('Cookies Found:\n')
             for cookie in self.cookies:
                 if cookie.getDomain() in self.originalMsgHost:
                     self.cookie += cookie.getName() + '=' + cookie.getValue() + '; '
                     self.textArea.append(cookie.getName() + '=' + cookie.getValue() + '\n')
-        scrollArea = JScrollPane(self.textArea)
+        infoPanel = JPanel()
+        infoPanel.layout = BorderLayout(3, 3)
+        infoPanel.add(JScrollPane(self.textArea), BorderLayout.NORTH)
+        infoPanel.add(self.UrlPanelLabel, BorderLayout.SOUTH)
+
+        # The list only renders visible rows, and fixed cell sizes stop it from measuring every URL
+        self.urlListModel = UrlListModel()
+        self.urlList = JList(self.urlListModel)
+        self.urlList.setFont(Font("Default", Font.PLAIN, 14))
+        self.urlList.setFixedCellHeight(18)
+        self.urlList.setFixedCellWidth(1200)
+        scrollArea = JScrollPane(self.urlList)
         scrollArea.setVerticalScrollBarPolicy(JScrollPane.VERTICAL_SCROLLBAR_ALWAYS)
         scrollArea.setPreferredSize(Dimension(400, 200))
         self.rightPanel = JPanel()
         self.rightPanel.setLayout(BorderLayout(3, 3))
-        self.rightPanel.add(self.UrlPanelLabel, BorderLayout.NORTH)
+        self.rightPanel.add(infoPanel, BorderLayout.NORTH)
         self.rightPanel.add(scrollArea, BorderLayout.CENTER)
         
-        # Panel for the generate URL list and import URL list buttons
+        # Panel for the generate URL list and import URL list buttons, with the import progress bar and cancel button below them
         generatePanel = JPanel()
-        generatePanel.layout = BorderLayout(3, 3)
-        generateButton = JButton('Generate URL List', actionPerformed=self.generateUrlList)
-        importButton = JButton('Import URL List to Burp Site Map', actionPerformed=self.confirmImport)
-        generatePanel.add("North", generateButton)
-        generatePanel.add("South", importButton)
+        generatePanel.layout = GridLayout(5, 1, 3, 3)
+        self.generateButton = JButton('Generate URL List', actionPerformed=self.generateUrlList)
+        listActionPanel = JPanel()
+        listActionPanel.layout = GridLayout(1, 2, 3, 3)
+        self.copyButton = JButton('Copy URL List', actionPerformed=self.copyUrlList)
+        self.exportButton = JButton('Export URL List', actionPerformed=self.exportUrlList)
+        listActionPanel.add(self.copyButton)
+        listActionPanel.add(self.exportButton)
+        self.importButton = JButton('Import URL List to Burp Site Map', actionPerformed=self.confirmImport)
+        # Per-phase timings and counters of the last parse and import, shown in the text area and exportable as JSON
+        metricsPanel = JPanel()
+        metricsPanel.layout = GridLayout(1, 2, 3, 3)
+        self.metricsCheckBox = JCheckBox('Collect metrics', False)
+        metricsPanel.add(self.metricsCheckBox)
+        metricsPanel.add(JButton('Export Metrics', actionPerformed=self.exportMetrics))
+        progressPanel = JPanel()
+        progressPanel.layout = BorderLayout(3, 3)
+        self.progressBar = JProgressBar(stringPainted=True)
+        self.cancelButton = JButton('Cancel', actionPerformed=self.cancelTask, enabled=False)
+        progressPanel.add(self.progressBar, BorderLayout.CENTER)
+        progressPanel.add(self.cancelButton, BorderLayout.EAST)
+        generatePanel.add(self.generateButton)
+        generatePanel.add(listActionPanel)
+        generatePanel.add(self.importButton)
+        generatePanel.add(metricsPanel)
+        generatePanel.add(progressPanel)
         self.rightPanel.add("South", generatePanel)
 
         # Add the two main panels to the left and right sides
@@ -190,13 +299,17 @@ class BurpExtender(IBurpExtender, IContextMenuFactory):
         self.window.show()
 
     # JFileChooser and showDialog for the user to specify their directory listing input file
+    # Several listings can be chosen at once.  They are kept in the upload field separated by the platform's path separator
     def chooseFile(self, event):
         chooseFile = JFileChooser()
-        filter = FileNameExtensionFilter("c files", ["c"])
+        chooseFile.setMultiSelectionEnabled(True)
+        filter = FileNameExtensionFilter("Listings, compressed listings and tar archives", list(LISTING_EXTENSIONS))
         chooseFile.addChoosableFileFilter(filter)
-        chooseFile.showDialog(self.uploadPanel, "Choose File")
-        chosenFile = chooseFile.getSelectedFile()
-        self.uploadTextField.text = str(chosenFile)
+        if chooseFile.showDialog(self.uploadPanel, "Choose File") == JFileChooser.APPROVE_OPTION:
+            self.uploadTextField.text = os.pathsep.join([str(chosenFile) for chosenFile in chooseFile.getSelectedFiles()])
+
+    def listingFiles(self):
+        return [filename.strip() for filename in self.uploadTextField.getText().split(os.pathsep) if filename.strip()]
 
     # Set whether https is enabled.  Default is disabled (http)
     def radioSsl(self, event):
@@ -205,61 +318,486 @@ class BurpExtender(IBurpExtender, IContextMenuFactory):
         else:
             self.SSL = 'http://'
 
-    # Create a parser object and pass the user's specified options.  Retrieve the results and print them to a text area
+    # Create a parser object and pass the user's specified options.  Parsing runs on a background thread and the list view is grown in batches
     def generateUrlList(self, event):
         fileListingType = self.comboListingType.selectedIndex
         self.listType = self.types[fileListingType]
-        urlsMade = 0
-        if os.path.isfile(self.uploadTextField.text):
-            parser = ListingParser()
-            parser.parse(self.hostnameTextField.getText(), self.dirPrefixField.getText().rstrip(), self.SSL, self.portTextField.getText(), self.listType, self.uploadTextField.getText())
+        filenames = self.listingFiles()
+        if filenames and all([os.path.isfile(filename) for filename in filenames]):
+            self.parseMetrics = Metrics(self.metricsCheckBox.isSelected())
+            parser = ListingParser(UrlFilter(parseRules(self.filterRules)), self.parseMetrics)
             self.parsedList = parser.returnList()
-            self.textArea.setText('')
-            for item in self.parsedList:
-                self.textArea.append(item + '\n')
-
-            urlsMade = str(len(self.parsedList))
-            if self.parsedList and urlsMade:
-                self.textArea.append('\n' + 'Total Directories Found: ' + str(parser.directoryCount))
-                self.textArea.append('\n' + 'Total URLs Created: ' + urlsMade)
-            else:
-                self.textArea.append('Error occurred during parsing.\n')
-                self.textArea.append('Please make sure the directory listing is a valid format and all input is correct.\n')
-                self.textArea.append('E-mail SmeegeSec@gmail.com with errors or for further help.')
+            self.urlListModel.setUrls(self.parsedList)
+            self.parseCancelled = False
+            self.parseFailed = False
+            self.generateButton.setEnabled(False)
+            self.importButton.setEnabled(False)
+            # Copying or exporting would read the whole store while the parse thread is still writing to it
+            self.copyButton.setEnabled(False)
+            self.exportButton.setEnabled(False)
+            self.cancelButton.setEnabled(True)
+            self.progressBar.setIndeterminate(True)
+            self.progressBar.setString('Parsing...')
+            args = (parser, self.hostnameTextField.getText(), self.dirPrefixField.getText().rstrip(), self.SSL, self.portTextField.getText(), self.listType, filenames)
+            parseThread = threading.Thread(target=self.runParse, args=args)
+            parseThread.setDaemon(True)
+            parseThread.start()
+        else:
+            JOptionPane.showMessageDialog(None, 'ERROR: A listing file is not valid or was not found!')
+
+    def runParse(self, parser, hostname, prefix, ssl, port, listType, filenames):
+        urlsFound = 0
+        shown = 0
+        lastFlush = time.time()
+        try:
+            for item in parser.iterListings(hostname, prefix, ssl, port, listType, filenames):
+                urlsFound += 1
+                # Reveal new URLs to the event thread in batches, at most four times a second or every 5000 URLs
+                if urlsFound - shown >= 5000 or time.time() - lastFlush > 0.25:
+                    self.flushUrls(urlsFound)
+                    shown = urlsFound
+                    lastFlush = time.time()
+                if self.parseCancelled:
+                    break
+        except ListingParserError, e:
+            SwingUtilities.invokeLater(lambda: JOptionPane.showMessageDialog(None, str(e)))
+        except:
+            # Bare except so nothing, Java exceptions included, ends the parse thread silently with a partial list
+            self.parseFailed = True
+            e = sys.exc_info()[1]
+            traceback.print_exc()
+            SwingUtilities.invokeLater(lambda: JOptionPane.showMessageDialog(None, 'ERROR: Parsing stopped after ' + str(urlsFound) + ' URL(s): ' + str(e)))
+        finally:
+            self.flushUrls(urlsFound)
+            SwingUtilities.invokeLater(lambda: self.finishParse(parser))
+
+    def flushUrls(self, size):
+        SwingUtilities.invokeLater(lambda: self.showUrls(size))
+
+    def showUrls(self, size):
+        self.urlListModel.showUrls(size)
+        self.progressBar.setString(str(size) + ' URLs')
+
+    def finishParse(self, parser):
+        self.generateButton.setEnabled(True)
+        self.importButton.setEnabled(True)
+        self.copyButton.setEnabled(True)
+        self.exportButton.setEnabled(True)
+        self.cancelButton.setEnabled(False)
+        self.progressBar.setIndeterminate(False)
+        self.progressBar.setString(None)
+        urlsMade = str(len(self.parsedList))
+        self.textArea.setText('')
+        if self.parseCancelled:
+            self.textArea.append('Parsing cancelled.\n')
+        elif self.parseFailed:
+            self.textArea.append('Parsing stopped by an error, the URL list is incomplete.\n')
+        if self.parsedList:
+            self.textArea.append('Listing Format: ' + ', '.join(parser.formats) + '\n')
+            self.textArea.append('Total Directories Found: ' + str(self.parsedList.directoryCount))
+            self.textArea.append('\n' + 'Total Files Found: ' + str(self.parsedList.fileCount))
+            self.textArea.append('\n' + 'Total URLs Created: ' + urlsMade)
+            self.showFilterHits(parser.urlFilter)
+            self.showMetrics(self.parseMetrics)
         else:
-            JOptionPane.showMessageDialog(None, 'ERROR: File is not valid file or not found!')
+            self.textArea.append('Error occurred during parsing.\n')
+            self.textArea.append('Please make sure the directory listing is a valid format and all input is correct.\n')
+            self.textArea.append('E-mail SmeegeSec@gmail.com with errors or for further help.')
+
+    # Number of paths each filter rule removed, or kept for include rules
+    def showFilterHits(self, urlFilter):
+        self.textArea.append('\n' + 'Filter Rule Hits:')
+        for rule, hits in urlFilter.hitCounts():
+            self.textArea.append('\n    ' + rule + '  ' + str(hits))
+        if urlFilter.hasIncludes:
+            self.textArea.append('\n    (not matching any include rule)  ' + str(urlFilter.notIncluded))
+
+    def showMetrics(self, metrics):
+        for line in metrics.report():
+            self.textArea.append('\n' + line)
+
+    # Write the metrics of the last parse and import as JSON
+    def exportMetrics(self, event):
+        exported = {}
+        if self.parseMetrics:
+            exported['parse'] = self.parseMetrics.toDict()
+        if self.importMetrics:
+            exported['import'] = self.importMetrics.toDict()
+        if not exported:
+            JOptionPane.showMessageDialog(None, 'No metrics yet.  Generate or import a URL list first.')
+            return
+        chooseFile = JFileChooser()
+        if chooseFile.showSaveDialog(self.uploadPanel) == JFileChooser.APPROVE_OPTION:
+            f = open(str(chooseFile.getSelectedFile()), 'w')
+            try:
+                f.write(json.dumps(exported, indent=2, sort_keys=True) + '\n')
+            finally:
+                f.close()
+
+    # Edit the include/exclude rules applied to every generated path.  Invalid rules are reported and the previous rules kept
+    def editFilterRules(self, event):
+        rulesArea = JTextArea(self.filterRules, 12, 40)
+        message = ['One rule per line as type:pattern with type keyword, glob, regex or ext (comma separated extensions).',
+                   'Lines without a type are keywords, a leading + makes an include rule and # starts a comment.',
+                   JScrollPane(rulesArea)]
+        result = JOptionPane.showConfirmDialog(None, message, "Filter Rules", JOptionPane.OK_CANCEL_OPTION, JOptionPane.PLAIN_MESSAGE)
+        if result == JOptionPane.OK_OPTION:
+            try:
+                # Building the filter also checks that the rules compile together
+                UrlFilter(parseRules(rulesArea.getText()))
+                self.filterRules = rulesArea.getText()
+            except ValueError, e:
+                JOptionPane.showMessageDialog(None, 'ERROR: ' + str(e))
+
+    # Copy the full URL list to the clipboard, not just the rows selected in the list view
+    def copyUrlList(self, event):
+        Toolkit.getDefaultToolkit().getSystemClipboard().setContents(StringSelection('\n'.join(self.parsedList)), None)
+
+    # Save the full URL list to a text file, one URL per line
+    def exportUrlList(self, event):
+        chooseFile = JFileChooser()
+        if chooseFile.showSaveDialog(self.uploadPanel) == JFileChooser.APPROVE_OPTION:
+            f = open(str(chooseFile.getSelectedFile()), 'w')
+            try:
+                for item in self.parsedList:
+                    f.write(item + '\n')
+            finally:
+                f.close()
 
     def closeUI(self, event):
+        self.cancelTask(event)
         self.window.setVisible(False)
         self.window.dispose()
 
     # This is initiated by the user selecting the 'import to burp' button.  Checks each generated URL for a valid response and adds it to the site map
     def importList(self):
         if self.parsedList:
-            urlsAdded = 0
-            # Loop through each URL and check the response.  If the response code is less than 404, add to site map
-            for item in self.parsedList:
-                # Pass exception if urlopen returns an http error if the URL is not reachable
-                try:
-                    code = urlopen(item).code
-                    if code < 404:
-                        javaURL = URL(item)
-                        newRequest = self._helpers.buildHttpRequest(javaURL)
-                        stringNewRequest = self._helpers.bytesToString(newRequest).rstrip()
-                        if self.cookie:
-                            stringNewRequest += '\nCookie: ' + self.cookie.rstrip('; ') + '\r\n\r\n'
-                            requestResponse = self._callbacks.makeHttpRequest(self._helpers.buildHttpService(str(javaURL.getHost()), int(javaURL.getPort()), javaURL.getProtocol() == "https"), stringNewRequest)
-                        else:
-                            requestResponse = self._callbacks.makeHttpRequest(self._helpers.buildHttpService(str(javaURL.getHost()), int(javaURL.getPort()), javaURL.getProtocol() == "https"), newRequest)
-                        self._callbacks.addToSiteMap(requestResponse)
-                        urlsAdded += 1
-                except Exception, e:
-                    print e
-                    pass
-            JOptionPane.showMessageDialog(None, str(urlsAdded) + " URL(s) added to Burp site map.")
+            try:
+                concurrency = int(self.threadsTextField.getText())
+                maxPerSecond = float(self.rateTextField.getText())
+                timeout = float(self.timeoutTextField.getText())
+                pruneStatuses = parseStatuses(self.pruneTextField.getText())
+                sampleSize = int(self.sampleTextField.getText())
+                if self.lightSizeTextField.getText().strip():
+                    self.lightSize = int(self.lightSizeTextField.getText())
+                else:
+                    self.lightSize = None
+                cacheTtl = float(self.cacheTtlTextField.getText()) * 3600
+                cacheSize = int(self.cacheSizeTextField.getText())
+            except ValueError:
+                JOptionPane.showMessageDialog(None, 'ERROR: Threads, requests per second, timeout, prune status codes, samples, light probe size and probe cache settings must be numbers.')
+                return
+            self.lightMethod = LIGHT_PROBE_METHODS[self.comboLightMethod.getSelectedIndex()][1]
+            self.fullFetch = self.fullFetchCheckBox.isSelected()
+            # The default journal is worked out again on every import rather than kept in the field, so changing the host or
+            # port between imports never sends one host's records to another host's journal
+            journalPath = self.journalTextField.getText().strip()
+            if not journalPath:
+                journalName = self.hostnameTextField.getText().strip() + '_' + self.portTextField.getText().strip() + '.journal'
+                journalPath = os.path.join(os.path.expanduser('~'), '.listing-import', journalName)
+            self.journal = ProbeJournal(journalPath)
+            if cacheSize > 0:
+                self.cache = ProbeCache(os.path.join(os.path.expanduser('~'), '.listing-import', 'probe-cache.tsv'), cacheTtl, cacheSize)
+            else:
+                self.cache = None
+            self.urlsAdded = 0
+            self.urlsSkipped = 0
+            self.singleRequest = self.singleRequestCheckBox.isSelected()
+            self.requestTemplates = {}
+            self.siteMapPaths = {}
+            self.siteMapLock = threading.Lock()
+            self.importMetrics = Metrics(self.metricsCheckBox.isSelected())
+            self.addToSiteMap = self.importMetrics.timedCall(self._callbacks.addToSiteMap, 'siteMap')
+            self.scheduler = None
+            self.progressOffset = 0
+            self.engine = ProbeEngine(self.probeUrl, self.addUrl, self.reportError, self.reportProgress, concurrency, maxPerSecond, timeout, True)
+            self.generateButton.setEnabled(False)
+            self.importButton.setEnabled(False)
+            self.cancelButton.setEnabled(True)
+            self.progressBar.setMaximum(len(self.parsedList))
+            self.progressBar.setValue(0)
+            # Run the import off the Swing event thread so Burp stays responsive
+            importThread = threading.Thread(target=self.runImport, args=(self.engine, self.parsedList, self.resumeCheckBox.isSelected(), pruneStatuses, sampleSize))
+            importThread.setDaemon(True)
+            importThread.start()
         else:
             JOptionPane.showMessageDialog(None, "The list of URLs is empty.  Please generate a valid list to import.")
 
+    def runImport(self, engine, urls, resume, pruneStatuses, sampleSize):
+        done = 0
+        total = len(urls)
+        try:
+            try:
+                probed = {}
+                if resume:
+                    # Skip every URL the journal already has a status code for
+                    probed = self.journal.load()
+                    if probed:
+                        urls = [item for item in urls if item not in probed]
+                        self.urlsSkipped = total - len(urls)
+                self.journal.open(resume)
+            except (IOError, OSError), e:
+                SwingUtilities.invokeLater(lambda: JOptionPane.showMessageDialog(None, 'ERROR: Cannot use import journal: ' + str(e)))
+                return
+            if self.cache:
+                try:
+                    self.cache.load()
+                except (IOError, OSError), e:
+                    print 'Probe cache not loaded: ' + str(e)
+            SwingUtilities.invokeLater(lambda: self.progressBar.setMaximum(len(urls)))
+            scheduler = TreeScheduler(urls, pruneStatuses, sampleSize)
+            # Directories found unreachable before the interruption still prune what is below them
+            for item, code in probed.items():
+                scheduler.record(item, code)
+            self.scheduler = scheduler
+            try:
+                # One directory level per engine run, so each directory's status is known before its contents are scheduled
+                for wave in scheduler.waves():
+                    if engine.isCancelled():
+                        break
+                    self.progressOffset = done + scheduler.prunedUrls
+                    done += engine.run(wave)
+            finally:
+                self.journal.close()
+                if not engine.isCancelled() and done + scheduler.prunedUrls >= len(urls):
+                    try:
+                        self.journal.remove()
+                    except (IOError, OSError), e:
+                        print 'Import journal not removed: ' + str(e)
+                if self.cache:
+                    try:
+                        self.cache.save()
+                    except (IOError, OSError), e:
+                        print 'Probe cache not saved: ' + str(e)
+            done += scheduler.prunedUrls
+            self.importMetrics.count('urls.skippedFromJournal', self.urlsSkipped)
+            self.importMetrics.count('urls.pruned', scheduler.prunedUrls)
+            self.importMetrics.count('urls.sampled', scheduler.sampledUrls)
+            if self.cache:
+                self.importMetrics.count('urls.cached', self.cache.hits)
+                self.importMetrics.count('urls.revalidated', self.cache.revalidated)
+        finally:
+            SwingUtilities.invokeLater(lambda: self.finishImport(done, len(urls)))
+
+    def finishImport(self, done, total):
+        self.generateButton.setEnabled(True)
+        self.importButton.setEnabled(True)
+        self.cancelButton.setEnabled(False)
+        if self.urlsSkipped:
+            skipped = "  " + str(self.urlsSkipped) + " URL(s) already in the import journal were skipped."
+        else:
+            skipped = ""
+        if self.scheduler and self.scheduler.prunedUrls:
+            skipped += "  " + str(self.scheduler.prunedUrls) + " URL(s) below " + str(self.scheduler.prunedDirectories) + " unreachable directory(s) were pruned"
+            if self.scheduler.sampledUrls:
+                skipped += " after probing " + str(self.scheduler.sampledUrls) + " sample(s)"
+            skipped += "."
+        if self.cache and (self.cache.hits or self.cache.revalidated):
+            skipped += "  " + str(self.cache.hits) + " URL(s) were answered from the probe cache and " + str(self.cache.revalidated) + " revalidated."
+        if self.importMetrics.enabled:
+            self.textArea.append('\n' + 'Import Metrics:')
+            self.showMetrics(self.importMetrics)
+        if done < total:
+            JOptionPane.showMessageDialog(None, "Import cancelled after " + str(done) + " of " + str(total) + " URL(s).  " + str(self.urlsAdded) + " URL(s) added to Burp site map." + skipped)
+        else:
+            JOptionPane.showMessageDialog(None, str(self.urlsAdded) + " URL(s) added to Burp site map." + skipped)
+
+    # Cancel whichever of parsing or importing is running
+    def cancelTask(self, event):
+        self.parseCancelled = True
+        if self.engine:
+            self.engine.cancel()
+
+    # Runs on the engine's worker threads.  Returns the status code, with the request/response pair for the site map if the code is less than 404.
+    # Every request waits for the engine's per-host rate limit first, as one URL can take up to three requests
+    def probeUrl(self, item, timeout):
+        pathStart = item.find('/', item.find('://') + 3)
+        if pathStart < 0:
+            base, path = item, '/'
+        else:
+            base, path = item[:pathStart], item[pathStart:].split('#', 1)[0]
+        template = self.requestTemplate(base)
+        method = self.probeMethod(item)
+
+        # A fresh cache entry answers without a request, a stale one is revalidated with a conditional request.  Neither
+        # adds anything to the site map, so a reachable URL is only answered from the cache if the site map already has a
+        # response for it.  In a new Burp project, or once the site map has been cleared, it is fetched again
+        key = base + path
+        conditions = []
+        if self.cache:
+            cached = self.cache.lookup(key)
+            if cached and (cached[0] >= 404 or path in self.siteMapResponses(base, template[0])):
+                code, fresh = cached
+                if fresh:
+                    self.cache.countHit()
+                    return code, None
+                conditions = self.cache.conditionalHeaders(key)
+
+        if not self.singleRequest:
+            request = Request(item)
+            if method == 'HEAD':
+                request.get_method = lambda: 'HEAD'
+            elif method == 'RANGE':
+                request.add_header('Range', 'bytes=0-0')
+            for condition in conditions:
+                name, value = condition.split(': ', 1)
+                request.add_header(name, value)
+            self.engine.throttle(item)
+            start = time.time()
+            try:
+                code = urlopen(request, timeout=timeout).code
+            except HTTPError, e:
+                code = e.code
+            self.importMetrics.observe('probe', template[0].getHost(), time.time() - start)
+            if code >= 404 and not (method == 'HEAD' and code in (405, 501)):
+                return self.cacheResponse(key, code, None), None
+        code, requestResponse = self.sendRequest(item, template, path, method, timeout, conditions)
+        # Some servers refuse HEAD, ask them for the first byte instead
+        if method == 'HEAD' and code in (405, 501):
+            method = 'RANGE'
+            code, requestResponse = self.sendRequest(item, template, path, method, timeout, conditions)
+        notModified = code == 304
+        code = self.cacheResponse(key, code, requestResponse)
+        if code >= 404:
+            return code, None
+        # A 304 has no body and only confirms the cached status, so like a fresh cache hit it is not added to the site map again
+        if notModified and conditions:
+            return code, None
+        if method and self.fullFetch:
+            code, requestResponse = self.sendRequest(item, template, path, None, timeout)
+            code = self.cacheResponse(key, code, requestResponse)
+            if code >= 404:
+                return code, None
+        return code, requestResponse
+
+    # Store a response in the probe cache and return the status it stands for, which for a 304 is the cached status
+    def cacheResponse(self, key, code, requestResponse):
+        if not self.cache:
+            return code
+        headers = []
+        if requestResponse is not None:
+            headers = self._helpers.analyzeResponse(requestResponse.getResponse()).getHeaders()
+        return self.cache.store(key, code, headers)
+
+    # HEAD or RANGE for a file the listing gives as larger than the light probe size, None to fetch it whole
+    def probeMethod(self, item):
+        if self.lightSize is None:
+            return None
+        index = self.parsedList.index(item)
+        if index < 0:
+            return None
+        isDirectory, size, date = self.parsedList.metadata(index)
+        if isDirectory == DIRECTORY or size <= self.lightSize:
+            return None
+        return self.lightMethod
+
+    # Send one request through Burp and return its status code and request/response pair
+    def sendRequest(self, item, template, path, method, timeout, headers=()):
+        httpService, requestStart, requestEnd = template
+        if method == 'RANGE':
+            headers = list(headers) + ['Range: bytes=0-0']
+        if headers:
+            # requestEnd finishes with the blank line closing the headers
+            requestEnd = requestEnd[:-2] + ''.join([header + '\r\n' for header in headers]) + '\r\n'
+        if method == 'HEAD':
+            request = 'HEAD ' + path + requestEnd
+        else:
+            request = requestStart + path + requestEnd
+        self.engine.throttle(item)
+        start = time.time()
+        requestResponse = self.makeHttpRequest(item, httpService, self._helpers.stringToBytes(request), timeout)
+        self.importMetrics.observe('probe', httpService.getHost(), time.time() - start)
+        response = requestResponse.getResponse()
+        if response is None:
+            raise IOError('No response received for ' + item)
+        return self._helpers.analyzeResponse(response).getStatusCode(), requestResponse
+
+    # makeHttpRequest has no timeout of its own, so it runs on a helper thread that is abandoned once the timeout passes
+    # or the import is cancelled.  An abandoned request still completes in Burp but its response is dropped
+    def makeHttpRequest(self, item, httpService, request, timeout):
+        outcome = []
+        finished = threading.Event()
+        def send():
+            # Bare except so Java exceptions are handed back to the worker as well
+            try:
+                outcome.append((self._callbacks.makeHttpRequest(httpService, request), None))
+            except:
+                outcome.append((None, sys.exc_info()[1]))
+            finished.set()
+        sender = threading.Thread(target=send)
+        sender.setDaemon(True)
+        sender.start()
+        deadline = time.time() + timeout
+        while not finished.isSet():
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise IOError('No response received for ' + item + ' within ' + str(timeout) + ' seconds')
+            if self.engine.isCancelled():
+                raise ProbeCancelled('Import cancelled while requesting ' + item)
+            finished.wait(min(remaining, 0.25))
+        requestResponse, exception = outcome[0]
+        if exception is not None:
+            raise exception
+        return requestResponse
+
+    # Paths of one protocol/host/port that Burp's site map holds a response for, read once per import and shared by every URL on it
+    def siteMapResponses(self, base, httpService):
+        self.siteMapLock.acquire()
+        try:
+            paths = self.siteMapPaths.get(base)
+            if paths is None:
+                paths = set()
+                # Burp's site map URLs only leave out the default port of the protocol, so any other port is part of the prefix
+                prefix = httpService.getProtocol() + '://' + httpService.getHost()
+                if httpService.getPort() != {'http': 80, 'https': 443}.get(httpService.getProtocol()):
+                    prefix += ':' + str(httpService.getPort())
+                prefix += '/'
+                for requestResponse in self._callbacks.getSiteMap(prefix):
+                    service = requestResponse.getHttpService()
+                    if requestResponse.getResponse() is not None and service.getPort() == httpService.getPort() and service.getProtocol() == httpService.getProtocol():
+                        paths.add(self._helpers.analyzeRequest(requestResponse).getUrl().getFile())
+                self.siteMapPaths[base] = paths
+            return paths
+        finally:
+            self.siteMapLock.release()
+
+    # HttpService and request text around the path for one protocol/host/port, built once per import and shared by every URL on it
+    def requestTemplate(self, base):
+        template = self.requestTemplates.get(base)
+        if template is None:
+            javaURL = URL(base + '/')
+            httpService = self._helpers.buildHttpService(str(javaURL.getHost()), int(javaURL.getPort()), javaURL.getProtocol() == "https")
+            request = self._helpers.bytesToString(self._helpers.buildHttpRequest(javaURL))
+            if self.cookie:
+                request = request.rstrip() + '\r\nCookie: ' + self.cookie.rstrip('; ') + '\r\n\r\n'
+            # The request line is 'GET / HTTP/1.1', so the path sits between the first space and ' HTTP/'
+            pathStart = request.index(' ') + 1
+            template = (httpService, request[:pathStart], request[request.index(' HTTP/', pathStart):])
+            self.requestTemplates[base] = template
+        return template
+
+    # Called by the engine in URL order from the import thread, so site map additions and journal records keep the order of the list
+    def addUrl(self, item, result):
+        code, requestResponse = result
+        self.journal.record(item, code)
+        self.scheduler.record(item, code)
+        self.importMetrics.count('urls.probed')
+        if requestResponse:
+            self.addToSiteMap(requestResponse)
+            self.urlsAdded += 1
+            self.importMetrics.count('urls.added')
+
+    # Print the exception if the URL is not reachable or no response was received, and count it by type
+    def reportError(self, item, e):
+        print e
+        self.importMetrics.count('errors.' + e.__class__.__name__)
+
+    # Only refresh the progress bar every 50 URLs so large imports do not flood the event queue
+    def reportProgress(self, done, total):
+        if done % 50 == 0 or done == total:
+            value = self.progressOffset + done
+            SwingUtilities.invokeLater(lambda: self.progressBar.setValue(value))
+
     def confirmImport(self, event):
         result = JOptionPane.showConfirmDialog(None, "You are about to make requests to potentially sensitive resources.\nRemove any sensitive resources from your listing file.\nProceed to import to Burp Site Map?", "Careful!", JOptionPane.WARNING_MESSAGE)
         if result == 0:
@@ -267,140 +805,35 @@ class BurpExtender(IBurpExtender, IContextMenuFactory):
 
     def printHeader(self):
         print '-------------------\nDirectory and File Listing Parser and Burp Site Map Importer\nSmeegeSec@gmail.com\n-------------------\n\n'
-# Class to parse the directory listing file specified by the user
-class ListingParser:
-    def parse(self, hostname, prefix, ssl, port, listing, filename):
-        self.fullUrlList = []
-        self.directoryCount = 0
-        if os.path.isfile(filename):
-            filePosition = 0
-            urlSuffix = ''
-            # Check the user's selection from the list type drop down and parse accordingly
-            if listing == 'Windows \'dir /s\'':
-                f = open(filename, "r")
-                lines = f.readlines()
-                for line in lines:
-                    # Windows directory files typically have two formats.  Conditional in place to detect which format and parse accordingly
-                    try:
-                        if 'Directory: ' in line:
-                            filePosition = 5
-                            directory = line.split('Directory: ', 1)[1]
-                            self.directoryCount += 1
-                        elif 'Directory of ' in line:
-                            filePosition = 4
-                            directory = line.split('Directory of ', 1)[1]
-                            self.directoryCount += 1
-                        # Using shlex to parse each line in the file, ignoring anything that is not a file
-                        if filePosition > 0 and len(shlex.split(line)) > filePosition:
-                                for num in range(filePosition, len(shlex.split(line))):
-                                    urlSuffix += shlex.split(line)[num] + " "
-                                if urlSuffix != ". " and urlSuffix != ".. " and 'logout' not in urlSuffix and 'logoff' not in urlSuffix and 'exit' not in urlSuffix and 'signout' not in urlSuffix:
-                                    dirPrefix = directory.split(prefix)[1].rstrip().replace('\\', '/')
-                                    if '.' in urlSuffix:
-                                        fullUrl = (hostname + ':' + port + '/' + dirPrefix + '/' + urlSuffix).rstrip().replace('//', '/')
-                                    else:
-                                        fullUrl = (hostname + ':' + port + '/' + dirPrefix + '/' + urlSuffix).rstrip().replace('//', '/') + '/'
-                                    self.fullUrlList.append(ssl + fullUrl)
-                                urlSuffix = ''
-                    except:
-                        pass
-            elif listing == 'Linux \'ls -lR\'':
-                f = open(filename, "r")
-                lines = f.readlines()
-                directory = '/'
-                parentDir = False
-                suffix = ''
-                for line in lines:
-                    try:
-                        if '.:' in line:
-                            parentDir = True
-                        elif '.' in line and ':\n' in line:
-                            parentDir = False
-                            directory = line[line.find('.') + 1 : line.find(':')]
-                            self.directoryCount += 1
-                        else:
-                            if len(shlex.split(line)) and 'total ' not in line:
-                                if parentDir:
-                                    for num in range(8,len(shlex.split(line))):
-                                        suffix += shlex.split(line)[num] + ' '
-                                    if '.' in suffix:
-                                        fullSuffix = directory + suffix.rstrip()
-                                    else:
-                                        fullSuffix = directory + suffix.rstrip() + '/'
-                                    if 'logout' not in fullSuffix and 'logoff' not in fullSuffix and 'exit' not in fullSuffix and 'signout' not in fullSuffix:
-                                        if prefix.rstrip() != 'C:\\var\www\\':
-                                            fullUrl = ssl + hostname + ':' + port + '/' + prefix.rstrip() + fullSuffix
-                                        else:
-                                            fullUrl = ssl + hostname + ':' + port + fullSuffix
-                                        self.fullUrlList.append(fullUrl)
-                                else:
-                                    for num in range(8, len(shlex.split(line))):
-                                        suffix += shlex.split(line)[num] + ' '
-                                    if '.' in suffix:
-                                        fullSuffix = directory + '/' + suffix.rstrip()
-                                    else:
-                                        fullSuffix = directory + '/' + suffix.rstrip() + '/'
-                                    if 'logout' not in fullSuffix and 'logoff' not in fullSuffix and 'exit' not in fullSuffix and 'signout' not in fullSuffix:
-                                        if prefix.rstrip() != 'C:\\var\www\\':
-                                            fullUrl = ssl + hostname + ':' + port + '/' + prefix.rstrip() + fullSuffix
-                                        else:
-                                            fullUrl = ssl + hostname + ':' + port + fullSuffix
-
-                                        self.fullUrlList.append(fullUrl)
-                                suffix = ''
-                    except:
-                        pass
-            elif listing == 'Linux \'ls -R\'':
-                f = open(filename, "r")
-                lines = f.readlines()
-                parentDir = False
-                directory = '/'
-                for line in lines:
-                    try:
-                        if '.:' in line:
-                            parentDir = True
-                        elif '.' in line and ':\n' in line:
-                            parentDir = False
-                            directory = line[line.find('.') + 1 : line.find(':')]
-                            self.directoryCount += 1
-                        else:
-                            if len(shlex.split(line)) and 'total ' not in line:
-                                if parentDir:
-                                    suffix = shlex.split(line)
-                                    for num in range(0, len(suffix)):
-                                        if '.' in suffix[num]:
-                                            if prefix.rstrip() != 'C:\\var\www\\':
-                                                fullUrl = ssl + hostname + ':' + port + '/' + prefix.rstrip() + directory + suffix[num]
-                                            else:
-                                                fullUrl = ssl + hostname + ':' + port + directory + suffix[num]
-                                        else:
-                                            print suffix[num]
-                                            if prefix.rstrip() != 'C:\\var\www\\':
-                                                fullUrl = ssl + hostname + ':' + port + '/' + prefix.rstrip() + directory + suffix[num] + '/'
-                                            else:
-                                                fullUrl = ssl + hostname + ':' + port + directory + suffix[num] + '/'
-
-                                        if 'logout' not in fullUrl and 'logoff' not in fullUrl and 'exit' not in fullUrl and 'signout' not in fullUrl:
-                                            self.fullUrlList.append(fullUrl)
-                                else:
-                                    for num in range(0, len(shlex.split(line))):
-                                        if prefix.rstrip() != 'C:\\var\www\\':
-                                            fullUrl = ssl + hostname + ':' + port + '/' + prefix.rstrip() + directory + '/' + shlex.split(line)[num]
-                                        else:
-                                            fullUrl = ssl + hostname + ':' + port + directory + '/' + shlex.split(line)[num]
-                                        if 'logout' not in fullUrl and 'logoff' not in fullUrl and 'exit' not in fullUrl and 'signout' not in fullUrl:
-                                            self.fullUrlList.append(fullUrl)
-                    except:
-                        pass
-            else:
-                JOptionPane.showMessageDialog(None, 'ERROR: Invalid or no listing type specified')
-        else:
-            JOptionPane.showMessageDialog(None, 'ERROR: ' + filename + ' is not a valid file or was not found!')
-
-        try:
-            f.close()
-        except:
-            pass
 
-    def returnList(self):
-        return self.fullUrlList
+# List model backed by the parsed URL store, so the list view only ever builds and renders the rows on screen.
+# The store is read on the event thread while the parse thread is still adding to it.  That is safe because the parse
+# thread only publishes a new size through SwingUtilities.invokeLater after the entries below it are written, entries
+# keep their index and are never removed, and the model never reads past the published size.  Anything reading the whole store,
+# like Copy and Export, is disabled until the parse has finished
+class UrlListModel(AbstractListModel):
+    def __init__(self):
+        self.urls = []
+        self.size = 0
+
+    def getSize(self):
+        return self.size
+
+    def getElementAt(self, index):
+        return self.urls[index]
+
+    # Switch to a new backing list, showing only its first size entries.  Must be called on the Swing event thread
+    def setUrls(self, urls, size=0):
+        if self.size:
+            self.fireIntervalRemoved(self, 0, self.size - 1)
+        self.urls = urls
+        self.size = size
+        if size:
+            self.fireIntervalAdded(self, 0, size - 1)
+
+    # Show the entries added to the backing list since the last call, repainting once for the whole batch.  Must be called on the Swing event thread
+    def showUrls(self, size):
+        if size > self.size:
+            start = self.size
+            self.size = size
+            self.fireIntervalAdded(self, start, size - 1)
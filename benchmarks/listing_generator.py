@@ -0,0 +1,238 @@
+"""
+Synthetic directory listing generator for the Directory and File Listing Parser benchmarks.
+
+Writes realistic 'dir /s' (both the 'Directory of' and PowerShell 'Directory:' variants), 'ls -lR', 'ls -R', 'find'
+and 'tree' (ASCII, as from tree --charset=ascii) listings of any size.  Trees are deep, names include spaces and quotes, and the output only depends on the seed,
+so the same arguments always give the same file and the same URL checksum.
+
+    python listing_generator.py -t ls-lR -s 64M -o listing.txt
+"""
+
+import argparse, random, sys
+from collections import deque
+
+GENERATOR_TYPES = ('windows-dir', 'windows-powershell', 'ls-lR', 'ls-R', 'find', 'tree')
+
+# Directory prefix of the generated Windows listings, to pass to the parser
+WINDOWS_ROOT = 'C:\\inetpub\\wwwroot'
+
+WORDS = ('admin', 'app', 'assets', 'backup', 'bin', 'cache', 'config', 'css', 'data', 'docs', 'download', 'images',
+         'img', 'include', 'js', 'lib', 'media', 'modules', 'old', 'private', 'public', 'reports', 'scripts', 'shared',
+         'static', 'templates', 'test', 'tmp', 'upload', 'user', 'vendor', 'web')
+EXTENSIONS = ('aspx', 'asp', 'bak', 'config', 'css', 'gif', 'htm', 'html', 'inc', 'jpg', 'js', 'json', 'log', 'php',
+              'png', 'sql', 'txt', 'xml', 'zip')
+MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+
+# Parse a size such as 512K, 64M or 2G into bytes
+def parseSize(text):
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+    text = text.strip().upper()
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+class ListingGenerator:
+    def __init__(self, listingType, seed=0, maxDepth=12):
+        if listingType not in GENERATOR_TYPES:
+            raise ValueError('Unknown listing type: ' + listingType)
+        self.listingType = listingType
+        self.random = random.Random(seed)
+        self.maxDepth = maxDepth
+        self.counter = 0
+
+    # Unique file or directory name.  About one in ten has a space and one in fifty a quote
+    def name(self, isDirectory):
+        self.counter += 1
+        roll = self.random.random()
+        word = self.random.choice(WORDS)
+        if roll < 0.1:
+            word += ' ' + self.random.choice(WORDS)
+        elif roll < 0.12:
+            word += "'s"
+        word += str(self.counter)
+        if isDirectory:
+            return word
+        return word + '.' + self.random.choice(EXTENSIONS)
+
+    # Entries of one directory as (name, isDirectory, size) tuples.  Deeper directories have fewer subdirectories
+    def entries(self, depth):
+        result = []
+        subdirectories = 0
+        if depth < self.maxDepth:
+            subdirectories = self.random.randint(0, max(1, 5 - depth // 3))
+        for i in range(subdirectories):
+            result.append((self.name(True), True, 4096))
+        for i in range(self.random.randint(0, 25)):
+            # Mostly small files with the occasional large media file or backup
+            if self.random.random() < 0.02:
+                size = self.random.randint(10 << 20, 4 << 30)
+            else:
+                size = int(self.random.expovariate(1.0 / 20000))
+            result.append((self.name(False), False, size))
+        self.random.shuffle(result)
+        return result
+
+    # Write listings until at least targetBytes have been written.  Returns the number of bytes written
+    def write(self, out, targetBytes):
+        if self.listingType in ('find', 'tree'):
+            return self.writeDepthFirst(out, targetBytes)
+        written = 0
+        tree = 0
+        while written < targetBytes:
+            # Start another site tree whenever the previous one runs out of directories
+            tree += 1
+            pending = deque([('site' + str(tree), 1)])
+            # Linux listings start with the '.:' block of the current directory, later trees only get their own block
+            if tree == 1 and self.listingType in ('ls-lR', 'ls-R'):
+                written += self.writeBlock(out, '', [(name, True, 4096) for name, depth in pending], True)
+            while pending and written < targetBytes:
+                path, depth = pending.popleft()
+                entries = self.entries(depth)
+                written += self.writeBlock(out, path, entries, False)
+                for name, isDirectory, size in entries:
+                    if isDirectory:
+                        pending.append((path + '/' + name, depth + 1))
+        return written
+
+    # 'find' and 'tree' print the contents of a directory straight after it, so their trees are walked depth first.
+    # Each site tree is its own 'tree' root, followed by the summary line
+    def writeDepthFirst(self, out, targetBytes):
+        written = 0
+        tree = 0
+        while written < targetBytes:
+            tree += 1
+            root = 'site' + str(tree)
+            if self.listingType == 'find':
+                text = './' + root + '\n'
+            else:
+                text = root + '\n'
+            out.write(text)
+            written += len(text)
+            directories = files = 0
+            # Directories being walked as (path, depth, indentation of their entries, entries not written yet)
+            stack = [(root, 1, '', deque(self.entries(1)))]
+            while stack and written < targetBytes:
+                path, depth, indent, entries = stack[-1]
+                if not entries:
+                    stack.pop()
+                    continue
+                name, isDirectory, size = entries.popleft()
+                if self.listingType == 'find':
+                    text = './' + path + '/' + name + '\n'
+                elif entries:
+                    text = indent + '|-- ' + name + '\n'
+                else:
+                    text = indent + '`-- ' + name + '\n'
+                out.write(text)
+                written += len(text)
+                if isDirectory:
+                    directories += 1
+                    if entries:
+                        childIndent = indent + '|   '
+                    else:
+                        childIndent = indent + '    '
+                    stack.append((path + '/' + name, depth + 1, childIndent, deque(self.entries(depth + 1))))
+                else:
+                    files += 1
+            if self.listingType == 'tree':
+                text = '\n%d directories, %d files\n\n' % (directories, files)
+                out.write(text)
+                written += len(text)
+        return written
+
+    def writeBlock(self, out, path, entries, isRoot):
+        if self.listingType == 'windows-dir':
+            text = self.windowsDirBlock(path, entries)
+        elif self.listingType == 'windows-powershell':
+            text = self.powershellBlock(path, entries)
+        elif self.listingType == 'ls-lR':
+            text = self.longListBlock(path, entries, isRoot)
+        else:
+            text = self.listBlock(path, entries, isRoot)
+        out.write(text)
+        return len(text)
+
+    def windowsDirBlock(self, path, entries):
+        lines = ['', ' Directory of ' + WINDOWS_ROOT + '\\' + path.replace('/', '\\'), '',
+                 '07/02/2013  10:00 AM    <DIR>          .',
+                 '07/02/2013  10:00 AM    <DIR>          ..']
+        fileCount = 0
+        totalSize = 0
+        for name, isDirectory, size in entries:
+            if isDirectory:
+                lines.append('07/02/2013  10:00 AM    <DIR>          ' + name)
+            else:
+                fileCount += 1
+                totalSize += size
+                lines.append('07/02/2013  10:00 AM %17s %s' % ('{:,}'.format(size), name))
+        lines.append('%16d File(s) %14s bytes' % (fileCount, '{:,}'.format(totalSize)))
+        return '\n'.join(lines) + '\n'
+
+    def powershellBlock(self, path, entries):
+        lines = ['', '    Directory: ' + WINDOWS_ROOT + '\\' + path.replace('/', '\\'), '', '',
+                 'Mode                LastWriteTime     Length Name',
+                 '----                -------------     ------ ----']
+        for name, isDirectory, size in entries:
+            if isDirectory:
+                lines.append('d----          7/2/2013  10:00 AM            ' + name)
+            else:
+                lines.append('-a---          7/2/2013  10:00 AM %10d %s' % (size, name))
+        return '\n'.join(lines) + '\n\n'
+
+    # Quote names the way GNU ls does, so the parser sees shell quoting for spaces and quotes
+    def quote(self, name):
+        if "'" in name:
+            return '"' + name + '"'
+        if ' ' in name:
+            return "'" + name + "'"
+        return name
+
+    def longListBlock(self, path, entries, isRoot):
+        if isRoot:
+            lines = ['.:']
+        else:
+            lines = ['./' + path + ':']
+        lines.append('total %d' % (sum([size for name, isDirectory, size in entries]) // 1024))
+        for name, isDirectory, size in entries:
+            if isDirectory:
+                mode = 'drwxr-xr-x'
+            else:
+                mode = '-rw-r--r--'
+            lines.append('%s 1 www-data www-data %10d %s %2d 10:00 %s' % (mode, size, self.random.choice(MONTHS), self.random.randint(1, 28), self.quote(name)))
+        return '\n'.join(lines) + '\n\n'
+
+    def listBlock(self, path, entries, isRoot):
+        if isRoot:
+            lines = ['.:']
+        else:
+            lines = ['./' + path + ':']
+        names = [self.quote(name) for name, isDirectory, size in entries]
+        for i in range(0, len(names), 4):
+            lines.append('  '.join(names[i:i + 4]))
+        return '\n'.join(lines) + '\n\n'
+
+
+def main(argv=None):
+    argParser = argparse.ArgumentParser(description='Generate a synthetic directory listing for benchmarks.')
+    argParser.add_argument('-t', '--type', required=True, choices=GENERATOR_TYPES, help='listing format')
+    argParser.add_argument('-s', '--size', default='1M', help='approximate size of the listing, e.g. 512K, 64M or 2G')
+    argParser.add_argument('--seed', type=int, default=0, help='random seed')
+    argParser.add_argument('-o', '--output', help='file to write the listing to (default: standard output)')
+    args = argParser.parse_args(argv)
+
+    if args.output:
+        out = open(args.output, 'w')
+    else:
+        out = sys.stdout
+    try:
+        ListingGenerator(args.type, args.seed).write(out, parseSize(args.size))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
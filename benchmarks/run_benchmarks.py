@@ -0,0 +1,289 @@
+"""
+Benchmark harness for the Directory and File Listing Parser and the site map import probing engine.
+
+Generates synthetic listings with listing_generator.py, parses each one in a fresh process and reports lines/s,
+URLs/s, peak memory and a SHA-1 checksum of the generated URLs, serially and split across worker processes as with -j.  The probing engine used by the import is measured
+against a local stand-in HTTP server, and the URL filter with growing numbers of glob and regex rules.  Results are written as JSON so they can be compared across releases.
+
+    python run_benchmarks.py --sizes 1M,64M,2G --jobs 1,4 --output results.json
+"""
+
+import argparse, hashlib, json, os, platform, random, shutil, subprocess, sys, tempfile, threading, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from listing_generator import EXTENSIONS, GENERATOR_TYPES, WINDOWS_ROOT, WORDS, ListingGenerator, parseSize
+from listing_parser import CHUNK_SIZE, DEFAULT_DIR_PREFIX, LISTING_TYPES, ListingParser, findFormat
+from probe_engine import ProbeEngine
+from url_filter import UrlFilter, parseRules
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urllib2 import urlopen
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.request import urlopen
+
+SCHEMA_VERSION = 2
+
+# Parser listing type and directory prefix for each generated format
+PARSER_SETTINGS = {
+    'windows-dir': (dict(LISTING_TYPES)['windows'], WINDOWS_ROOT + '\\'),
+    'windows-powershell': (dict(LISTING_TYPES)['powershell'], WINDOWS_ROOT + '\\'),
+    'ls-lR': (dict(LISTING_TYPES)['ls-lR'], DEFAULT_DIR_PREFIX),
+    'ls-R': (dict(LISTING_TYPES)['ls-R'], DEFAULT_DIR_PREFIX),
+    'find': (dict(LISTING_TYPES)['find'], DEFAULT_DIR_PREFIX),
+    'tree': (dict(LISTING_TYPES)['tree'], DEFAULT_DIR_PREFIX),
+}
+
+
+# Peak resident memory of this process in KB, or None where it cannot be measured
+def peakMemoryKB():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports KB
+    if sys.platform == 'darwin':
+        peak //= 1024
+    return peak
+
+
+# Whether a parse with this many jobs is really split across worker processes, which needs a format with a chunk
+# header and a listing of at least two chunks
+def splitsListing(generatorType, size, jobs, chunkSize):
+    return jobs != 1 and findFormat(PARSER_SETTINGS[generatorType][0]).chunkHeader is not None and size >= 2 * chunkSize
+
+
+# Parse one listing and return its measurements.  Runs in a child process so peak memory only covers this parse, and
+# with more than one job the worker processes are left out of it
+def parseOne(filename, generatorType, jobs, chunkSize):
+    listing, prefix = PARSER_SETTINGS[generatorType]
+    f = open(filename, 'rb')
+    try:
+        lines = sum(1 for line in f)
+    finally:
+        f.close()
+
+    parser = ListingParser()
+    urls = 0
+    start = time.time()
+    if jobs == 1:
+        fullUrls = parser.iterUrls('bench.example.com', prefix, 'https://', '443', listing, filename)
+    else:
+        fullUrls = parser.iterUrlsParallel('bench.example.com', prefix, 'https://', '443', listing, filename, jobs or None, chunkSize)
+    for fullUrl in fullUrls:
+        urls += 1
+    seconds = time.time() - start
+
+    # The checksum is taken from the store afterwards so hashing does not count towards the parse time
+    digest = hashlib.sha1()
+    for fullUrl in parser.returnList():
+        if not isinstance(fullUrl, bytes):
+            fullUrl = fullUrl.encode('utf-8', 'surrogateescape')
+        digest.update(fullUrl + b'\n')
+    return {
+        'type': generatorType,
+        'sizeBytes': os.path.getsize(filename),
+        'jobs': jobs,
+        'split': splitsListing(generatorType, os.path.getsize(filename), jobs, chunkSize),
+        'lines': lines,
+        'urls': urls,
+        'seconds': round(seconds, 4),
+        'linesPerSecond': int(lines / seconds) if seconds else None,
+        'urlsPerSecond': int(urls / seconds) if seconds else None,
+        'peakMemoryKB': peakMemoryKB(),
+        'sha1': digest.hexdigest(),
+    }
+
+
+def parseBenchmark(workdir, generatorType, size, seed, jobs, chunkSize):
+    filename = os.path.join(workdir, '%s-%d-%d.txt' % (generatorType, size, seed))
+    if not os.path.isfile(filename):
+        out = open(filename, 'w')
+        try:
+            ListingGenerator(generatorType, seed).write(out, size)
+        finally:
+            out.close()
+    output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--parse-one', filename, generatorType,
+                                      '--jobs', str(jobs), '--chunk-size', str(chunkSize)])
+    return json.loads(output.decode('utf-8'))
+
+
+# Stand-in web server answering 404 for every path containing 'missing' and 200 for everything else, after a fixed delay
+class ProbeHandler(BaseHTTPRequestHandler):
+    latency = 0.005
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        if 'missing' in self.path:
+            self.send_response(404)
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ProbeServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+# Probe through the engine the way importList does: URLs under 404 are kept, HTTP errors are reported as failures
+def probeBenchmark(urlCount, concurrency, latency):
+    ProbeHandler.latency = latency
+    server = ProbeServer(('127.0.0.1', 0), ProbeHandler)
+    serverThread = threading.Thread(target=server.serve_forever)
+    serverThread.daemon = True
+    serverThread.start()
+    try:
+        base = 'http://127.0.0.1:%d/' % server.server_address[1]
+        urls = []
+        for i in range(urlCount):
+            if i % 5 == 0:
+                urls.append(base + 'missing/%d.html' % i)
+            else:
+                urls.append(base + 'dir%d/file%d.html' % (i % 50, i))
+        added = []
+        engine = ProbeEngine(lambda url, timeout: urlopen(url, timeout=timeout).getcode(), lambda url, code: added.append(url),
+                             concurrency=concurrency, timeout=10)
+        start = time.time()
+        engine.run(urls)
+        seconds = time.time() - start
+    finally:
+        server.shutdown()
+        server.server_close()
+    return {
+        'urls': urlCount,
+        'concurrency': concurrency,
+        'latencyMs': latency * 1000,
+        'added': len(added),
+        'failed': engine.failed,
+        'seconds': round(seconds, 4),
+        'urlsPerSecond': int(urlCount / seconds) if seconds else None,
+    }
+
+
+# Filter generated paths through rule sets of growing size.  The time per path should stay about the same whatever
+# the number of rules; slowdown is the time taken relative to the smallest rule set
+def filterBenchmark(pathCount, ruleCounts, seed):
+    generator = random.Random(seed)
+    paths = []
+    for i in range(pathCount):
+        segments = [generator.choice(WORDS) + str(generator.randint(0, 999)) for depth in range(generator.randint(1, 6))]
+        paths.append('/' + '/'.join(segments) + '.' + generator.choice(EXTENSIONS))
+    results = []
+    for ruleCount in ruleCounts:
+        lines = []
+        for i in range(ruleCount):
+            word = generator.choice(WORDS)
+            if i % 4 == 0:
+                lines.append('glob:*%d.%s' % (i, generator.choice(EXTENSIONS)))
+            elif i % 4 == 1:
+                lines.append('regex:/%s%d/' % (word, i))
+            else:
+                lines.append('glob:*/%s%d/*' % (word, i))
+        urlFilter = UrlFilter(parseRules('\n'.join(lines)))
+        start = time.time()
+        kept = sum(1 for path in paths if urlFilter.allows(path))
+        seconds = time.time() - start
+        results.append({
+            'paths': pathCount,
+            'rules': ruleCount,
+            'kept': kept,
+            'seconds': round(seconds, 4),
+            'microsecondsPerPath': round(seconds * 1e6 / pathCount, 2) if pathCount else None,
+            'slowdown': round(seconds / results[0]['seconds'], 2) if results and results[0]['seconds'] else 1.0,
+        })
+    return results
+
+
+def main(argv=None):
+    argParser = argparse.ArgumentParser(description='Benchmark the listing parser and the import probing engine.')
+    argParser.add_argument('--types', default=','.join(GENERATOR_TYPES), help='comma separated listing formats (default: all)')
+    argParser.add_argument('--sizes', default='1M,16M', help='comma separated listing sizes, e.g. 1M,256M,2G (default: 1M,16M)')
+    argParser.add_argument('--jobs', default='1,4', help='comma separated worker process counts to parse with, as with -j; 0 is one per CPU (default: 1,4)')
+    argParser.add_argument('--chunk-size', default='%dM' % (CHUNK_SIZE >> 20), help='listing chunk size for the worker processes; listings under two chunks are parsed serially (default: 16M)')
+    argParser.add_argument('--seed', type=int, default=0, help='random seed for the generated listings')
+    argParser.add_argument('--workdir', help='folder for the generated listings, reused between runs (default: a temporary folder)')
+    argParser.add_argument('--probe-urls', type=int, default=2000, help='number of URLs in the probing benchmark, 0 to skip it')
+    argParser.add_argument('--probe-concurrency', default='1,8,32', help='comma separated worker counts for the probing benchmark')
+    argParser.add_argument('--probe-latency', type=float, default=5, help='stand-in server response delay in milliseconds')
+    argParser.add_argument('--filter-paths', type=int, default=50000, help='number of paths in the filter benchmark, 0 to skip it')
+    argParser.add_argument('--filter-rules', default='4,100,500', help='comma separated glob and regex rule counts for the filter benchmark')
+    argParser.add_argument('-o', '--output', help='file to write the JSON results to (default: standard output)')
+    argParser.add_argument('--parse-one', nargs=2, metavar=('FILE', 'TYPE'), help=argparse.SUPPRESS)
+    args = argParser.parse_args(argv)
+
+    if args.parse_one:
+        sys.stdout.write(json.dumps(parseOne(args.parse_one[0], args.parse_one[1], int(args.jobs), parseSize(args.chunk_size))))
+        return 0
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='listing-bench-')
+    if not os.path.isdir(workdir):
+        os.makedirs(workdir)
+    results = {
+        'schemaVersion': SCHEMA_VERSION,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_implementation() + ' ' + platform.python_version(),
+        'platform': platform.platform(),
+        'parse': [],
+        'probe': [],
+        'filter': [],
+    }
+    try:
+        chunkSize = parseSize(args.chunk_size)
+        for generatorType in args.types.split(','):
+            generatorType = generatorType.strip()
+            for size in args.sizes.split(','):
+                serial = None
+                for jobs in args.jobs.split(','):
+                    jobs = int(jobs)
+                    # Formats and sizes that are not split would only measure the serial parse again
+                    if jobs != 1 and not splitsListing(generatorType, parseSize(size), jobs, chunkSize):
+                        continue
+                    result = parseBenchmark(workdir, generatorType, parseSize(size), args.seed, jobs, chunkSize)
+                    if jobs == 1:
+                        serial = result
+                    # Speedup over the serial parse of the same listing; the checksums should match too
+                    if serial is not None and result['seconds']:
+                        result['speedup'] = round(serial['seconds'] / result['seconds'], 2)
+                    sys.stderr.write('%(type)s %(sizeBytes)d bytes, %(jobs)d jobs: %(linesPerSecond)s lines/s, %(urlsPerSecond)s URLs/s, %(peakMemoryKB)s KB peak\n' % result)
+                    results['parse'].append(result)
+        if args.probe_urls > 0:
+            for concurrency in args.probe_concurrency.split(','):
+                result = probeBenchmark(args.probe_urls, int(concurrency), args.probe_latency / 1000.0)
+                sys.stderr.write('probe %(urls)d URLs with %(concurrency)d workers: %(urlsPerSecond)s URLs/s\n' % result)
+                results['probe'].append(result)
+        if args.filter_paths > 0:
+            ruleCounts = [int(count) for count in args.filter_rules.split(',')]
+            for result in filterBenchmark(args.filter_paths, ruleCounts, args.seed):
+                sys.stderr.write('filter %(paths)d paths with %(rules)d rules: %(microsecondsPerPath)s us/path, %(slowdown)sx\n' % result)
+                results['filter'].append(result)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        out = open(args.output, 'w')
+        try:
+            out.write(text + '\n')
+        finally:
+            out.close()
+    else:
+        sys.stdout.write(text + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+Opens listing files for the Directory and File Listing Parser, decompressing them while they are read.
+
+gzip, bzip2 and xz compression is recognised from the first bytes of the file rather than its name, and a tar
+archive (compressed or not) is read member by member, each regular file being one listing.  Everything is
+streamed, so memory use does not grow with the size of the listing and nothing is written to disk.  xz needs the
+lzma module, which Python 2 and Jython do not have.  Listings are read as UTF-8 unless they start with a byte order
+mark, such as the UTF-16 written by PowerShell's '>' redirection.
+"""
+
+import codecs, io, sys, tarfile, zlib
+
+try:
+    import gzip
+except ImportError:
+    gzip = None
+
+try:
+    import bz2
+except ImportError:
+    bz2 = None
+
+try:
+    import lzma
+except ImportError:
+    lzma = None
+
+# Compression formats as (name, magic bytes at the start of the file)
+COMPRESSION_MAGIC = (('gzip', b'\x1f\x8b'), ('bzip2', b'BZh'), ('xz', b'\xfd7zXZ\x00'))
+
+# Text encodings as (encoding, byte order mark at the start of the listing).  Python 3 decodes UTF-8 and Python 2 reads
+# the listing as UTF-8 bytes unless one of these is found
+BYTE_ORDER_MARKS = (('utf-8-sig', codecs.BOM_UTF8), ('utf-16', codecs.BOM_UTF16_LE), ('utf-16', codecs.BOM_UTF16_BE))
+
+# Exceptions raised while reading a missing, truncated or corrupt listing file or archive
+LISTING_READ_ERRORS = (IOError, OSError, EOFError, tarfile.TarError, zlib.error)
+if lzma is not None:
+    LISTING_READ_ERRORS += (lzma.LZMAError,)
+
+# File name extensions offered by the extension's file chooser
+LISTING_EXTENSIONS = ('txt', 'lst', 'log', 'out', 'gz', 'tgz', 'bz2', 'tbz2', 'xz', 'txz', 'tar')
+
+
+# Raised for a compression format this Python cannot read
+class ListingFileError(Exception):
+    pass
+
+
+# Python 2 parses listings as UTF-8 byte strings, so the lines of a listing decoded from its byte order mark are encoded back.
+# Windows line ends are turned into '\n' as Python 3 does
+class Utf8Lines:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        line = next(self.stream)
+        if line.endswith(u'\r\n'):
+            line = line[:-2] + u'\n'
+        return line.encode('utf-8')
+
+    __next__ = next
+
+    def close(self):
+        self.stream.close()
+
+
+# Open a listing as text.  Python 3 decodes it as UTF-8 and keeps undecodable bytes, so odd file names survive the round trip.
+# A listing starting with a byte order mark is decoded as it says
+def openListing(filename):
+    if detectEncoding(readHead(filename)) is not None:
+        return textStream(open(filename, 'rb'))
+    if sys.version_info[0] >= 3:
+        return open(filename, 'r', encoding='utf-8', errors='surrogateescape')
+    return open(filename, 'r')
+
+
+# Text lines of a seekable binary stream, decoded the same way as openListing
+def textStream(raw):
+    encoding = detectEncoding(raw.read(4))
+    raw.seek(0)
+    if sys.version_info[0] >= 3:
+        if encoding is None or encoding == 'utf-8-sig':
+            return io.TextIOWrapper(raw, encoding=encoding or 'utf-8', errors='surrogateescape')
+        return io.TextIOWrapper(raw, encoding=encoding, errors='replace')
+    if encoding is None:
+        return raw
+    return Utf8Lines(codecs.getreader(encoding)(raw, 'replace'))
+
+
+# First bytes of the file, enough for its compression magic or byte order mark
+def readHead(filename):
+    f = open(filename, 'rb')
+    try:
+        return f.read(6)
+    finally:
+        f.close()
+
+
+# Name of the compression used by the file, or None
+def detectCompression(filename):
+    head = readHead(filename)
+    for name, magic in COMPRESSION_MAGIC:
+        if head.startswith(magic):
+            return name
+    return None
+
+
+# Encoding given by the byte order mark the text starts with, or None for UTF-8 without one
+def detectEncoding(head):
+    for encoding, mark in BYTE_ORDER_MARKS:
+        if head.startswith(mark):
+            return encoding
+    return None
+
+
+# Function opening the file as a decompressed binary stream
+def decompressor(filename, compression):
+    if compression is None:
+        return lambda: open(filename, 'rb')
+    if compression == 'gzip' and gzip is not None:
+        return lambda: gzip.GzipFile(filename, 'rb')
+    if compression == 'bzip2' and bz2 is not None:
+        return lambda: bz2.BZ2File(filename, 'rb')
+    if compression == 'xz' and lzma is not None:
+        return lambda: lzma.LZMAFile(filename, 'rb')
+    raise ListingFileError('ERROR: ' + filename + ' is ' + compression + ' compressed, which this Python cannot read.  Decompress it first.')
+
+
+# True for an uncompressed listing without a byte order mark that is not a tar archive, the only kind that can be split for parallel parsing
+def isPlainListing(filename):
+    return detectCompression(filename) is None and detectEncoding(readHead(filename)) is None and not isTar(decompressor(filename, None))
+
+
+# Tar archives hold 'ustar' at offset 257 of their first header block
+def isTar(opener):
+    f = opener()
+    try:
+        block = f.read(512)
+    finally:
+        f.close()
+    return len(block) >= 262 and block[257:262] == b'ustar'
+
+
+# Generator yielding (name, open text stream) for each listing in the file: the file itself, or every regular file of
+# a tar archive.  Each stream is closed when the next one is requested
+def listingStreams(filename):
+    compression = detectCompression(filename)
+    opener = decompressor(filename, compression)
+    if isTar(opener):
+        # Members are read in archive order, so even a compressed archive is only decompressed front to back once
+        archive = tarfile.open(filename, 'r:*')
+        try:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                f = textStream(archive.extractfile(member))
+                try:
+                    yield filename + '/' + member.name, f
+                finally:
+                    f.close()
+        finally:
+            archive.close()
+    elif compression is None:
+        f = openListing(filename)
+        try:
+            yield filename, f
+        finally:
+            f.close()
+    else:
+        f = textStream(opener())
+        try:
+            yield filename, f
+        finally:
+            f.close()
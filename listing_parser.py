@@ -0,0 +1,787 @@
+"""
+Name:           Directory and File Listing Parser
+Author:         Smeege
+Contact:        SmeegeSec@gmail.com
+
+Description:    Pure Python core of the Directory and File Listing Parser and Burp Site Map Importer.  It turns 'dir /s',
+                PowerShell 'Get-ChildItem -Recurse', 'ls -lR', 'ls -R', 'find' and 'tree' listings into URLs without
+                needing Java or Burp, so it can be used from the Burp extension, from other Python code under CPython
+                or Jython, or from the command line.  Each format is a registered ListingFormat with a detector that
+                looks at the first few KB, so the format can be recognised before the full pass.  The size, date
+                and directory flag of each entry are kept in the parser's store where the listing gives them.
+                Listings may be gzip, bzip2 or xz compressed, or tar archives of several listings:
+
+                    python listing_parser.py -t ls-lR -H www.example.com -p 443 --ssl -o urls.txt listing1.txt listing2.txt
+"""
+
+import argparse, io, itertools, os, re, shlex, sys
+from array import array
+from listing_files import LISTING_READ_ERRORS, ListingFileError, isPlainListing, listingStreams, openListing
+from metrics import Metrics
+from path_store import DIRECTORY, DIRECTORY_HEADER, FILE, SIZE_TYPECODE, UNKNOWN, PathStore
+from url_filter import UrlFilter, parseRules
+
+# multiprocessing and mmap are not available under Jython, where parsing always runs in a single thread
+try:
+    import mmap, multiprocessing
+except ImportError:
+    mmap = multiprocessing = None
+
+try:
+    intern
+except NameError:
+    from sys import intern
+
+# Default value of the directory prefix field, meaning no prefix should be added to Linux listings
+DEFAULT_DIR_PREFIX = 'C:\\var\\www\\'
+
+# Lines containing any of these characters need shlex to handle quotes, escapes or unusual whitespace
+needsShlex = re.compile(r'[\'"\\\x0b\x0c\x1c-\x1f]|[^\x00-\x7f]').search
+
+# Split a listing line into tokens.  Most lines hold no quotes or escapes, so a plain split gives the same result as shlex much faster
+def tokenize(line):
+    if needsShlex(line):
+        return shlex.split(line)
+    return line.split()
+
+# Directory flag, size and date of a 'dir /s' entry.  The size column holds '<DIR>' (or '<JUNCTION>') for directories
+def windowsEntry(tokens, filePosition):
+    size = tokens[filePosition - 1].replace(',', '')
+    date = intern(' '.join(tokens[max(filePosition - 4, 0):filePosition - 1]))
+    if size.isdigit():
+        return FILE, int(size), date
+    if size.startswith('<'):
+        return DIRECTORY, -1, date
+    return UNKNOWN, -1, date
+
+# Directory flag, size and date of an 'ls -l' entry, from the file mode, size and date columns
+def linuxLongEntry(tokens):
+    mode = tokens[0][:1]
+    if mode == 'd':
+        isDirectory = DIRECTORY
+    elif mode == '-':
+        isDirectory = FILE
+    else:
+        isDirectory = UNKNOWN
+    size = -1
+    date = None
+    if len(tokens) > 8:
+        if tokens[4].isdigit():
+            size = int(tokens[4])
+        date = intern(' '.join(tokens[5:8]))
+    return isDirectory, size, date
+
+# Approximate size of the chunks a listing is split into for parallel parsing
+CHUNK_SIZE = 16 << 20
+
+# Number of characters read from the start of a listing to recognise its format
+SAMPLE_SIZE = 8192
+
+# Raised for a missing listing file or unknown listing type
+class ListingParserError(Exception):
+    pass
+
+# Class to parse the directory listing file specified by the user
+class ListingParser:
+    def __init__(self, urlFilter=None, metrics=None):
+        self.store = PathStore()
+        if urlFilter is None:
+            urlFilter = UrlFilter()
+        self.urlFilter = urlFilter
+        if metrics is None:
+            metrics = Metrics(False)
+        self.metrics = metrics
+        # Tokenizing one line takes about as long as reading the clock around it, so only a sample of the lines is timed
+        self.tokenize = metrics.sampledCall(tokenize, 'tokenize')
+        # Labels of the formats the listings were parsed as, in the order first seen
+        self.formats = []
+
+    def parse(self, hostname, prefix, ssl, port, listing, filename):
+        for fullUrl in self.iterUrls(hostname, prefix, ssl, port, listing, filename):
+            pass
+
+    # Generator reading the listing file lazily and yielding each new URL as soon as it is built.  URLs are also kept in the parser's store.
+    # A compressed file is decompressed while it is read, and each listing in a tar archive is parsed in turn
+    def iterUrls(self, hostname, prefix, ssl, port, listing, filename):
+        chosenFormat = self.listingFormat(listing, filename)
+        metrics = self.metrics
+        addUrl = metrics.timedCall(self.store.add, 'store')
+        streams = listingStreams(filename)
+        try:
+            for name, f in streams:
+                metrics.count('listings')
+                # The format is settled from a sample of each listing before its full pass, so the line parser never dispatches per line
+                sample = sampleLines(f)
+                listingFormat = self.checkFormat(chosenFormat, sample, name)
+                lines = metrics.timedIter(itertools.chain(sample, f), 'read', 'lines')
+                entries = metrics.timedIter(listingFormat.parse(self, lines, hostname, prefix, ssl, port), 'parse')
+                for fullUrl, isDirectory, size, date in self.filterUrls(entries, ssl):
+                    # Overlapping listings repeat URLs, only the first occurrence is kept
+                    if addUrl(fullUrl, isDirectory, size, date):
+                        yield fullUrl
+                    elif isDirectory != DIRECTORY_HEADER:
+                        metrics.count('urls.duplicate')
+        except ListingFileError as e:
+            raise ListingParserError(str(e))
+        except LISTING_READ_ERRORS as e:
+            raise ListingParserError('ERROR: Cannot read ' + filename + ': ' + str(e))
+        finally:
+            streams.close()
+
+    # iterUrls over several listing files in turn, removing URLs repeated between them.  Every file is checked before the first is parsed
+    def iterListings(self, hostname, prefix, ssl, port, listing, filenames):
+        for filename in filenames:
+            self.listingFormat(listing, filename)
+        for filename in filenames:
+            for fullUrl in self.iterUrls(hostname, prefix, ssl, port, listing, filename):
+                yield fullUrl
+
+    # Same as iterUrls, but the listing is split at directory headers and the chunks are parsed by a pool of processes.
+    # URLs still come out in file order.  Falls back to iterUrls under Jython, or when the file is too small to split, compressed or a tar archive
+    def iterUrlsParallel(self, hostname, prefix, ssl, port, listing, filename, processes=None, chunkSize=CHUNK_SIZE):
+        listingFormat = self.listingFormat(listing, filename)
+        if multiprocessing is None or processes == 1 or os.path.getsize(filename) < 2 * chunkSize or not isPlainListing(filename):
+            for fullUrl in self.iterUrls(hostname, prefix, ssl, port, listing, filename):
+                yield fullUrl
+            return
+        f = openListing(filename)
+        try:
+            sample = sampleLines(f)
+        finally:
+            f.close()
+        # Formats whose state runs across the whole listing cannot be split
+        detected = listingFormat or detectFormat(sample)
+        if detected is None or detected.chunkHeader is None:
+            for fullUrl in self.iterUrls(hostname, prefix, ssl, port, listing, filename):
+                yield fullUrl
+            return
+        listingFormat = self.checkFormat(listingFormat, sample, filename)
+        listing = listingFormat.label
+
+        rulesText = '\n'.join([str(rule) for rule in self.urlFilter.rules])
+        metrics = self.metrics
+        tasks = [(filename, start, end, hostname, prefix, ssl, port, listing, rulesText, metrics.enabled) for start, end in splitListing(filename, listingFormat.chunkHeader, chunkSize)]
+        store = self.store
+        addUrl = metrics.timedCall(store.add, 'store')
+        metrics.count('listings')
+        pool = multiprocessing.Pool(processes)
+        try:
+            # imap hands the chunks back in file order while later chunks are still being parsed.  The workers have already
+            # built, filtered and grouped the entries by directory, so all that is left here is deduplication
+            for groups, names, flags, sizes, dates, hits, notIncluded, chunkMetrics in pool.imap(parseChunk, tasks):
+                for rule, count in zip(self.urlFilter.rules, hits):
+                    rule.hits += count
+                self.urlFilter.notIncluded += notIncluded
+                if chunkMetrics:
+                    metrics.merge(chunkMetrics)
+                if not groups:
+                    continue
+                names = names.split('\n')
+                added = 0
+                start = 0
+                for directoryUrl, count in groups:
+                    end = start + count
+                    if directoryUrl is None:
+                        # URLs without a path are stored whole
+                        for i in range(start, end):
+                            if addUrl(names[i], flags[i], sizes[i], dates[i]):
+                                added += 1
+                                yield names[i]
+                    else:
+                        for fullUrl in metrics.timedIter(store.addDirectory(directoryUrl, names[start:end], flags[start:end], sizes[start:end], dates[start:end]), 'store'):
+                            added += 1
+                            yield fullUrl
+                    start = end
+                duplicates = len(names) - added - flags.count(DIRECTORY_HEADER)
+                if duplicates:
+                    metrics.count('urls.duplicate', duplicates)
+            pool.close()
+        finally:
+            pool.terminate()
+
+    # Check the listing file and return the user's selected ListingFormat, or None to detect the format of each listing
+    def listingFormat(self, listing, filename):
+        if not os.path.isfile(filename):
+            raise ListingParserError('ERROR: ' + filename + ' is not a valid file or was not found!')
+        if listing in (AUTO_DETECT, dict(AUTO_DETECT_TYPE)[AUTO_DETECT]):
+            return None
+        listingFormat = findFormat(listing)
+        if listingFormat is None:
+            raise ListingParserError('ERROR: Invalid or no listing type specified')
+        return listingFormat
+
+    # The format to parse a listing with, given its first lines.  A chosen format is kept unless the sample clearly is another format,
+    # which would otherwise only show as an empty URL list after a full pass
+    def checkFormat(self, chosenFormat, sample, name):
+        detected = detectFormat(sample)
+        if chosenFormat is None:
+            if detected is None:
+                raise ListingParserError('ERROR: Cannot recognise the listing format of ' + name + '.  Please choose the listing type.')
+            chosenFormat = detected
+        elif detected is not None and detected is not chosenFormat and not chosenFormat.detect(sample):
+            raise ListingParserError('ERROR: ' + name + ' looks like a ' + detected.label + ' listing, not ' + chosenFormat.label + '.  Choose that type or auto-detect.')
+        self.metrics.count('format.' + chosenFormat.name)
+        if chosenFormat.label not in self.formats:
+            self.formats.append(chosenFormat.label)
+        return chosenFormat
+
+    # Filter the (URL, directory flag, size, date) entries of a line parser on the path after the host and port.  Directory
+    # header entries only mark an already stored URL as a directory, so they go to the store without being filtered or counted
+    def filterUrls(self, entries, ssl):
+        allows = self.metrics.timedCall(self.urlFilter.allows, 'filter')
+        count = self.metrics.count
+        pathStart = len(ssl)
+        parsed = 0
+        try:
+            for entry in entries:
+                if entry[1] == DIRECTORY_HEADER:
+                    yield entry
+                    continue
+                parsed += 1
+                fullUrl = entry[0]
+                if allows(fullUrl[fullUrl.find('/', pathStart):]):
+                    yield entry
+                else:
+                    count('urls.filtered')
+        finally:
+            count('urls.parsed', parsed)
+
+    def parseWindowsDir(self, lines, hostname, prefix, ssl, port):
+        tokenize = self.tokenize
+        skip = self.metrics.count
+        filePosition = 0
+        dirPrefix = None
+        urlBase = hostname + ':' + port + '/'
+        for line in lines:
+            # Windows directory files typically have two formats.  Conditional in place to detect which format and parse accordingly
+            try:
+                if 'Directory: ' in line:
+                    filePosition = 5
+                    directory = line.split('Directory: ', 1)[1]
+                    dirPrefix = self.windowsDirPrefix(directory, prefix)
+                elif 'Directory of ' in line:
+                    filePosition = 4
+                    directory = line.split('Directory of ', 1)[1]
+                    dirPrefix = self.windowsDirPrefix(directory, prefix)
+                # Tokenize each line in the file once, ignoring anything that is not a file
+                if filePosition > 0:
+                    tokens = tokenize(line)
+                    if len(tokens) > filePosition:
+                        urlSuffix = ' '.join(tokens[filePosition:]) + ' '
+                        if dirPrefix is None:
+                            skip('lines.skipped.outsidePrefix')
+                        elif urlSuffix == ". " or urlSuffix == ".. ":
+                            skip('lines.skipped.dotEntry')
+                        else:
+                            fullUrl = (urlBase + dirPrefix + '/' + urlSuffix).rstrip().replace('//', '/')
+                            if '.' not in urlSuffix:
+                                fullUrl += '/'
+                            isDirectory, size, date = windowsEntry(tokens, filePosition)
+                            yield ssl + fullUrl, isDirectory, size, date
+                    else:
+                        skip('lines.skipped.tooFewColumns')
+                else:
+                    skip('lines.skipped.beforeFirstDirectory')
+            except ValueError:
+                skip('lines.skipped.unparsable')
+
+    # Path of a Windows directory relative to the user's prefix, or None if the directory is outside of it
+    def windowsDirPrefix(self, directory, prefix):
+        try:
+            return directory.split(prefix)[1].rstrip().replace('\\', '/')
+        except (IndexError, ValueError):
+            return None
+
+    # Start of every Linux URL, with the user's prefix unless the field was left at its Windows default
+    def linuxUrlBase(self, hostname, prefix, ssl, port):
+        if prefix.rstrip() != DEFAULT_DIR_PREFIX:
+            return ssl + hostname + ':' + port + '/' + prefix.rstrip()
+        return ssl + hostname + ':' + port
+
+    def parseLinuxLongList(self, lines, hostname, prefix, ssl, port):
+        tokenize = self.tokenize
+        skip = self.metrics.count
+        urlBase = self.linuxUrlBase(hostname, prefix, ssl, port)
+        directory = '/'
+        parentDir = False
+        for line in lines:
+            try:
+                if '.:' in line:
+                    parentDir = True
+                elif '.' in line and ':\n' in line:
+                    parentDir = False
+                    directory = line[line.find('.') + 1 : line.find(':')]
+                else:
+                    tokens = tokenize(line)
+                    if tokens and 'total ' not in line:
+                        # The file name starts at the ninth column of 'ls -l' output
+                        suffix = ' '.join(tokens[8:]).rstrip()
+                        if parentDir:
+                            fullSuffix = directory + suffix
+                        else:
+                            fullSuffix = directory + '/' + suffix
+                        if '.' not in suffix:
+                            fullSuffix += '/'
+                        isDirectory, size, date = linuxLongEntry(tokens)
+                        yield urlBase + fullSuffix, isDirectory, size, date
+                    elif tokens:
+                        skip('lines.skipped.total')
+                    else:
+                        skip('lines.skipped.blank')
+            except ValueError:
+                skip('lines.skipped.unparsable')
+
+    def parseLinuxList(self, lines, hostname, prefix, ssl, port):
+        tokenize = self.tokenize
+        skip = self.metrics.count
+        urlBase = self.linuxUrlBase(hostname, prefix, ssl, port)
+        parentDir = False
+        directory = '/'
+        for line in lines:
+            try:
+                if '.:' in line:
+                    parentDir = True
+                elif '.' in line and ':\n' in line:
+                    parentDir = False
+                    directory = line[line.find('.') + 1 : line.find(':')]
+                    # 'ls -R' entries carry no type, so each header marks the URL its parent listed for it as a directory
+                    parent, separator, name = directory.rpartition('/')
+                    if parent:
+                        yield urlBase + directory, DIRECTORY_HEADER, -1, None
+                    elif separator and name:
+                        yield urlBase + directory + ('' if '.' in name else '/'), DIRECTORY_HEADER, -1, None
+                else:
+                    tokens = tokenize(line)
+                    if tokens and 'total ' not in line:
+                        if parentDir:
+                            for name in tokens:
+                                if '.' in name:
+                                    yield urlBase + directory + name, UNKNOWN, -1, None
+                                else:
+                                    yield urlBase + directory + name + '/', UNKNOWN, -1, None
+                        else:
+                            for name in tokens:
+                                yield urlBase + directory + '/' + name, UNKNOWN, -1, None
+                    elif tokens:
+                        skip('lines.skipped.total')
+                    else:
+                        skip('lines.skipped.blank')
+            except ValueError:
+                skip('lines.skipped.unparsable')
+
+    # PowerShell 'Get-ChildItem -Recurse' tables.  Names are cut at the column of the 'Name' heading, so they may hold spaces,
+    # and the mode column tells directories from files
+    def parsePowerShell(self, lines, hostname, prefix, ssl, port):
+        skip = self.metrics.count
+        urlBase = hostname + ':' + port + '/'
+        dirPrefix = None
+        nameColumn = -1
+        for line in lines:
+            line = line.rstrip('\r\n')
+            if 'Directory: ' in line:
+                dirPrefix = self.windowsDirPrefix(line.split('Directory: ', 1)[1], prefix)
+                continue
+            if line.startswith('Mode ') and line.rstrip().endswith('Name'):
+                nameColumn = line.rindex('Name')
+                continue
+            if nameColumn < 0 or len(line) <= nameColumn:
+                skip('lines.skipped.notAnEntry')
+                continue
+            columns = line[:nameColumn].split()
+            if not columns or not powerShellMode(columns[0]):
+                skip('lines.skipped.notAnEntry')
+                continue
+            if dirPrefix is None:
+                skip('lines.skipped.outsidePrefix')
+                continue
+            fullUrl = (urlBase + dirPrefix + '/' + line[nameColumn:].rstrip()).replace('//', '/')
+            if columns[0].startswith('d'):
+                yield ssl + fullUrl + '/', DIRECTORY, -1, intern(' '.join(columns[1:]))
+            elif columns[-1].isdigit():
+                yield ssl + fullUrl, FILE, int(columns[-1]), intern(' '.join(columns[1:-1]))
+            else:
+                yield ssl + fullUrl, FILE, -1, intern(' '.join(columns[1:]))
+
+    # 'find' output, one path per line, or 'find -ls' with the 'ls -l' columns in front.  A relative prefix is added to every path
+    # like other Linux listings.  An absolute prefix is the web root on the server: it is removed from absolute paths, which are
+    # skipped when outside it, and relative paths already start at the web root.  An entry is a directory when the next path lies below it
+    def parseFind(self, lines, hostname, prefix, ssl, port):
+        skip = self.metrics.count
+        rootBase = ssl + hostname + ':' + port
+        root = prefix.rstrip().rstrip('/')
+        if prefix.rstrip() == DEFAULT_DIR_PREFIX or not prefix.startswith('/'):
+            root = None
+            urlBase = self.linuxUrlBase(hostname, prefix, ssl, port)
+        else:
+            urlBase = rootBase
+        pending = None
+        for line in lines:
+            path = line.rstrip('\r\n')
+            isDirectory, size, date = UNKNOWN, -1, None
+            columns = path.split(None, 10)
+            if len(columns) == 11 and columns[0].isdigit() and linuxMode(columns[2]):
+                isDirectory, size, date = linuxLongEntry(columns[2:])
+                # find -ls escapes spaces and backslashes in names
+                path = findEscape('\\1', columns[10].split(' -> ', 1)[0])
+            if path.startswith('./'):
+                url = urlBase + path[1:]
+            elif path.startswith('/'):
+                if root is not None and path.rstrip('/') == root:
+                    # The starting point itself, like '.' in relative output
+                    skip('lines.skipped.root')
+                    continue
+                if root is None:
+                    url = rootBase + path
+                elif path.startswith(root + '/'):
+                    url = rootBase + path[len(root):]
+                else:
+                    skip('lines.skipped.outsidePrefix')
+                    continue
+            elif path and path != '.':
+                url = urlBase + '/' + path
+            else:
+                skip('lines.skipped.blank' if not path else 'lines.skipped.root')
+                continue
+            if pending is not None:
+                yield findEntry(pending, url.startswith(pending[0] + '/'))
+            pending = (url, isDirectory, size, date)
+        if pending is not None:
+            yield findEntry(pending, False)
+
+    # 'tree' output drawn with box characters or with ASCII (tree -A/--charset=ascii).  An entry is a directory when the next
+    # line is indented below it or, with tree -F, when its name ends in '/'.  Sizes from tree -s are kept
+    def parseTree(self, lines, hostname, prefix, ssl, port):
+        skip = self.metrics.count
+        urlBase = self.linuxUrlBase(hostname, prefix, ssl, port)
+        path = []
+        pending = None
+        for line in lines:
+            found = treeEntry(line)
+            if found:
+                depth = len(treeIndent(found.group(1)))
+            else:
+                # The root, the summary and blank lines end the current tree
+                depth = -1
+            if pending is not None:
+                pendingDepth, name, size = pending
+                hasChildren = depth > pendingDepth
+                yield treeUrl(urlBase, path, name, size, hasChildren)
+                if hasChildren:
+                    path.append(name.rstrip('/'))
+            if not found:
+                skip('lines.skipped.notAnEntry')
+                pending = None
+                del path[:]
+                continue
+            del path[depth:]
+            name = found.group(2)
+            size = -1
+            if name.startswith('['):
+                columns, separator, rest = name[1:].partition(']')
+                if separator:
+                    name = rest.lstrip()
+                    columns = columns.split()
+                    if columns and columns[-1].isdigit():
+                        size = int(columns[-1])
+            pending = (depth, name.split(' -> ', 1)[0], size)
+        if pending is not None:
+            yield treeUrl(urlBase, path, pending[1], pending[2], False)
+
+    # The deduplicated URLs in the order they were found, with directoryCount and fileCount
+    def returnList(self):
+        return self.store
+
+
+# Lines of a listing from its start up to about SAMPLE_SIZE characters, for format detection
+def sampleLines(f, size=SAMPLE_SIZE):
+    sample = []
+    total = 0
+    for line in f:
+        sample.append(line)
+        total += len(line)
+        if total >= size:
+            break
+    return sample
+
+# File mode column of 'ls -l' output, e.g. '-rw-r--r--' or 'drwxr-xr-x.'
+linuxMode = re.compile(r'^[-dlcbps][-rwxsStT]{9}[.+@]?$').match
+
+# Mode column of PowerShell tables, e.g. 'd-----', '-a----' or 'la---', but not the '----' underlining its heading
+powerShellMode = re.compile(r'^[-dlarhs]{5,6}$').match
+
+findEscape = re.compile(r'\\(.)').sub
+
+# URL of a 'find' entry once the next path shows whether it has children.  Entries without children and without
+# 'find -ls' columns are taken as files
+def findEntry(entry, hasChildren):
+    url, isDirectory, size, date = entry
+    if hasChildren or isDirectory == DIRECTORY:
+        return url + '/', DIRECTORY, size, date
+    return url, isDirectory if isDirectory != UNKNOWN else FILE, size, date
+
+# Box drawing and NO-BREAK SPACE characters used by 'tree' are matched as UTF-8 bytes under Python 2
+def textPattern(pattern):
+    if sys.version_info[0] < 3:
+        pattern = pattern.encode('utf-8')
+    return re.compile(pattern)
+
+# One indentation level of 'tree' output, and an entry line: indentation, then a branch such as '|-- ' and the name
+treeIndentPattern = u'(?:\u2502|\\|)(?: |\u00a0){3}|(?: |\u00a0){4}'
+treeIndent = textPattern(treeIndentPattern).findall
+treeEntry = textPattern(u'^((?:' + treeIndentPattern + u')*)(?:\u251c\u2500\u2500|\u2514\u2500\u2500|\\|--|`--)(?: |\u00a0)(.*?)\r?\n?$').match
+
+def treeUrl(urlBase, path, name, size, hasChildren):
+    if hasChildren or name.endswith('/'):
+        return urlBase + '/' + '/'.join(path + [name.rstrip('/')]) + '/', DIRECTORY, -1, None
+    return urlBase + '/' + '/'.join(path + [name]), FILE, size, None
+
+
+# A listing format: its command line name, the label shown in the Burp extension, the ListingParser method parsing it,
+# a detector scoring a sample of lines (0 when the sample is not this format) and, for formats that can be split for
+# parallel parsing, a bytes regex matching the lines that reset the parser's state
+class ListingFormat:
+    def __init__(self, name, label, parse, detect, chunkHeader=None):
+        self.name = name
+        self.label = label
+        self.parse = parse
+        self.detect = detect
+        self.chunkHeader = chunkHeader
+
+# Registered formats in the order they are offered, which also breaks ties between detectors
+FORMATS = []
+
+def registerFormat(listingFormat):
+    FORMATS.append(listingFormat)
+
+# Format by command line name or label, or None
+def findFormat(listing):
+    for listingFormat in FORMATS:
+        if listing == listingFormat.name or listing == listingFormat.label:
+            return listingFormat
+    return None
+
+# Best scoring format for a sample of lines, or None if no detector recognises it
+def detectFormat(sample):
+    best = None
+    bestScore = 0
+    for listingFormat in FORMATS:
+        score = listingFormat.detect(sample)
+        if score > bestScore:
+            best, bestScore = listingFormat, score
+    return best
+
+# Detectors count the lines only their format produces
+def detectWindowsDir(sample):
+    return sum([10 for line in sample if ' Directory of ' in line]) + sum([1 for line in sample if '<DIR>' in line or 'Directory: ' in line])
+
+def detectPowerShell(sample):
+    score = sum([5 for line in sample if 'Directory: ' in line])
+    if score:
+        score += sum([10 for line in sample if line.startswith('Mode ') and 'LastWriteTime' in line])
+    return score
+
+def isLinuxHeader(line):
+    line = line.rstrip('\r\n')
+    return line == '.:' or (line.startswith('./') and line.endswith(':')) or (line.startswith('/') and line.endswith(':'))
+
+def detectLinuxLongList(sample):
+    modes = sum([2 for line in sample if linuxMode(line.split(None, 1)[0] if line.strip() else '')])
+    if not modes:
+        return 0
+    return modes + sum([1 for line in sample if isLinuxHeader(line)])
+
+def detectLinuxList(sample):
+    if detectLinuxLongList(sample) or detectFind(sample):
+        return 0
+    return sum([1 for line in sample if isLinuxHeader(line)])
+
+def detectFind(sample):
+    paths = [line for line in sample if line.strip()]
+    if not paths or [line for line in paths if isLinuxHeader(line)]:
+        return 0
+    found = 0
+    for line in paths:
+        columns = line.split(None, 10)
+        if line.startswith('./') or line.startswith('/') or line.rstrip('\r\n') == '.':
+            found += 1
+        elif len(columns) == 11 and columns[0].isdigit() and linuxMode(columns[2]):
+            found += 1
+    # Every line of find output is a path, so anything else rules it out
+    if found < len(paths):
+        return 0
+    return found
+
+def detectTree(sample):
+    return sum([2 for line in sample if treeEntry(line)])
+
+registerFormat(ListingFormat('windows', 'Windows \'dir /s\'', ListingParser.parseWindowsDir, detectWindowsDir,
+                            re.compile(br'^[^\n]*Directory(?: of|:) ', re.M)))
+registerFormat(ListingFormat('powershell', 'PowerShell \'Get-ChildItem -Recurse\'', ListingParser.parsePowerShell, detectPowerShell,
+                            re.compile(br'^[^\n]*Directory: ', re.M)))
+# Linux lines containing '.:' are left out as the parser does not treat them as directory headers
+registerFormat(ListingFormat('ls-lR', 'Linux \'ls -lR\'', ListingParser.parseLinuxLongList, detectLinuxLongList,
+                            re.compile(br'^\./(?![^\n]*\.:)[^\n]*:\r?$', re.M)))
+registerFormat(ListingFormat('ls-R', 'Linux \'ls -R\'', ListingParser.parseLinuxList, detectLinuxList,
+                            re.compile(br'^\./(?![^\n]*\.:)[^\n]*:\r?$', re.M)))
+registerFormat(ListingFormat('find', 'Linux \'find\'', ListingParser.parseFind, detectFind))
+registerFormat(ListingFormat('tree', '\'tree\'', ListingParser.parseTree, detectTree))
+
+# Pseudo type recognising the format of each listing from its first lines
+AUTO_DETECT = 'auto'
+AUTO_DETECT_TYPE = ((AUTO_DETECT, 'Auto-detect'),)
+
+# Listing types as (command line name, label shown in the Burp extension), auto-detection first
+LISTING_TYPES = AUTO_DETECT_TYPE + tuple([(listingFormat.name, listingFormat.label) for listingFormat in FORMATS])
+
+
+# Byte ranges of a listing split just before the header lines of its format, each roughly chunkSize long
+def splitListing(filename, header, chunkSize):
+    size = os.path.getsize(filename)
+    bounds = [0]
+    f = open(filename, 'rb')
+    try:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            position = chunkSize
+            while position < size:
+                found = header.search(data, position)
+                if not found:
+                    break
+                bounds.append(found.start())
+                position = found.start() + chunkSize
+        finally:
+            data.close()
+    finally:
+        f.close()
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+# Parse one chunk of a listing in a worker process.  The entries passing the filter are grouped by directory and sent back as
+# a list of (directory URL, number of entries) pairs, the entry names joined by newlines, arrays of directory flags and sizes
+# and a list of dates, which is far cheaper to send and to merge than one tuple per URL.  The hit count of each filter rule
+# and the chunk's metrics, when they are enabled, come along with them
+def parseChunk(task):
+    filename, start, end, hostname, prefix, ssl, port, listing, rulesText, metricsEnabled = task
+    f = open(filename, 'rb')
+    try:
+        f.seek(start)
+        data = f.read(end - start)
+    finally:
+        f.close()
+    # Read the chunk exactly as openListing would read the whole file
+    if sys.version_info[0] >= 3:
+        lines = io.TextIOWrapper(io.BytesIO(data), encoding='utf-8', errors='surrogateescape')
+    else:
+        lines = io.BytesIO(data)
+
+    metrics = Metrics(metricsEnabled)
+    parser = ListingParser(UrlFilter(parseRules(rulesText)), metrics)
+    listingFormat = parser.listingFormat(listing, filename)
+    lines = metrics.timedIter(lines, 'read', 'lines')
+    parsed = metrics.timedIter(listingFormat.parse(parser, lines, hostname, prefix, ssl, port), 'parse')
+    groups = []
+    names = []
+    flags = array('b')
+    sizes = array(SIZE_TYPECODE)
+    dates = []
+    directoryUrl = None
+    count = 0
+    pathStart = len(ssl)
+    for fullUrl, isDirectory, size, date in parser.filterUrls(parsed, ssl):
+        slash = fullUrl.rfind('/')
+        if slash < pathStart:
+            directory, name = None, fullUrl
+        else:
+            directory, name = fullUrl[:slash], fullUrl[slash + 1:]
+        if directory != directoryUrl or not groups:
+            if groups:
+                groups[-1][1] = count
+            groups.append([directory, 0])
+            directoryUrl = directory
+            count = 0
+        count += 1
+        names.append(name)
+        flags.append(isDirectory)
+        sizes.append(size)
+        dates.append(date)
+    if groups:
+        groups[-1][1] = count
+    chunkMetrics = None
+    if metricsEnabled:
+        chunkMetrics = metrics.toDict()
+    return groups, '\n'.join(names), flags, sizes, dates, [rule.hits for rule in parser.urlFilter.rules], parser.urlFilter.notIncluded, chunkMetrics
+
+
+def main(argv=None):
+    argParser = argparse.ArgumentParser(description='Generate URLs from directory and file listings.')
+    argParser.add_argument('files', nargs='+', help='listing files to parse, plain, gzip, bzip2 or xz compressed, or tar archives of listings')
+    argParser.add_argument('-t', '--type', default=AUTO_DETECT, choices=[name for name, label in LISTING_TYPES], help='type of file listing (default: detected from each listing)')
+    argParser.add_argument('-H', '--hostname', required=True, help='hostname used in the URLs')
+    argParser.add_argument('-p', '--port', help='port used in the URLs (default 80, or 443 with --ssl)')
+    argParser.add_argument('--prefix', default=DEFAULT_DIR_PREFIX, help='full directory prefix to strip from Windows listings, or path prefix to add to Linux listings')
+    argParser.add_argument('--ssl', action='store_true', help='generate https URLs')
+    argParser.add_argument('--filter-rules', help='file of filter rules, one per line (default: exclude logout, logoff, exit and signout)')
+    argParser.add_argument('-l', '--long', action='store_true', help='write the size and date given by the listing after each URL, separated by tabs')
+    argParser.add_argument('--metrics', metavar='FILE', help='write timings and counters of the run as JSON to FILE, and a summary to stderr')
+    argParser.add_argument('-o', '--output', help='file to write the URLs to (default: standard output)')
+    argParser.add_argument('-j', '--jobs', type=int, default=1, help='number of processes parsing each listing in parallel (0 for one per CPU)')
+    args = argParser.parse_args(argv)
+
+    listing = dict(LISTING_TYPES)[args.type]
+    ssl = 'https://' if args.ssl else 'http://'
+    port = args.port or ('443' if args.ssl else '80')
+    try:
+        if args.filter_rules:
+            f = openListing(args.filter_rules)
+            try:
+                urlFilter = UrlFilter(parseRules(f.read()))
+            finally:
+                f.close()
+        else:
+            urlFilter = UrlFilter()
+    except (IOError, ValueError) as e:
+        argParser.error(str(e))
+
+    metrics = Metrics(bool(args.metrics))
+    parser = ListingParser(urlFilter, metrics)
+    store = parser.returnList()
+    if args.output:
+        if sys.version_info[0] >= 3:
+            out = open(args.output, 'w', encoding='utf-8', errors='surrogateescape')
+        else:
+            out = open(args.output, 'w')
+    else:
+        out = sys.stdout
+    try:
+        index = 0
+        for filename in args.files:
+            for fullUrl in parser.iterUrlsParallel(args.hostname, args.prefix.rstrip(), ssl, port, listing, filename, args.jobs or None):
+                if args.long:
+                    # URLs are yielded in the order they are stored
+                    isDirectory, size, date = store.metadata(index)
+                    index += 1
+                    out.write('%s\t%s\t%s\n' % (fullUrl, size if size >= 0 else '', date or ''))
+                else:
+                    out.write(fullUrl + '\n')
+    except ListingParserError as e:
+        sys.stderr.write(str(e) + '\n')
+        return 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    sys.stderr.write('Listing Format: %s\n' % ', '.join(parser.formats))
+    sys.stderr.write('Total Directories Found: %d\nTotal Files Found: %d\nTotal URLs Created: %d\n' % (store.directoryCount, store.fileCount, len(store)))
+    if args.metrics:
+        for line in metrics.report():
+            sys.stderr.write(line + '\n')
+        f = open(args.metrics, 'w')
+        try:
+            f.write(metrics.toJson() + '\n')
+        finally:
+            f.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""
+Instrumentation shared by the Directory and File Listing Parser and the site map import.
+
+Collects time per phase (read, tokenize, build, filter and store while parsing; probe and siteMap while importing),
+named counters such as lines read, skipped lines by reason, URLs and errors by type, and a latency histogram of the
+probes sent to each host.  A disabled Metrics hands back the iterables and functions it is asked to time unchanged
+and ignores counts, so leaving the hooks in place costs next to nothing.  Results can be shown as text or exported
+as JSON.
+"""
+
+import json, threading, time
+
+# Order phases are reported in.  'build' is the time the line parser spends on its own, after reading and tokenizing
+PHASES = ('read', 'tokenize', 'build', 'filter', 'store', 'probe', 'siteMap')
+
+# Upper bounds of the latency histogram buckets in milliseconds, with a last bucket for anything slower
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Metrics:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.timers = {}
+        self.counters = {}
+        self.latencies = {}
+        # Running totals of timedCall wrappers, one list per phase, read when the metrics are reported
+        self.cells = {}
+
+    def count(self, name, amount=1):
+        if not self.enabled:
+            return
+        self.lock.acquire()
+        try:
+            self.counters[name] = self.counters.get(name, 0) + amount
+        finally:
+            self.lock.release()
+
+    def addTime(self, phase, seconds):
+        if not self.enabled:
+            return
+        self.lock.acquire()
+        try:
+            self.timers[phase] = self.timers.get(phase, 0.0) + seconds
+        finally:
+            self.lock.release()
+
+    # Add the time of one request to the phase and to the latency histogram of its host.  Safe to call from any thread
+    def observe(self, phase, host, seconds):
+        if not self.enabled:
+            return
+        milliseconds = seconds * 1000
+        bucket = 0
+        while bucket < len(LATENCY_BUCKETS_MS) and milliseconds > LATENCY_BUCKETS_MS[bucket]:
+            bucket += 1
+        self.lock.acquire()
+        try:
+            self.timers[phase] = self.timers.get(phase, 0.0) + seconds
+            latency = self.latencies.get(host)
+            if latency is None:
+                latency = self.latencies[host] = {'counts': [0] * (len(LATENCY_BUCKETS_MS) + 1), 'count': 0, 'totalSeconds': 0.0, 'maxSeconds': 0.0}
+            latency['counts'][bucket] += 1
+            latency['count'] += 1
+            latency['totalSeconds'] += seconds
+            latency['maxSeconds'] = max(latency['maxSeconds'], seconds)
+        finally:
+            self.lock.release()
+
+    # Iterate over iterable, adding the time spent waiting for each item to phase and the number of items to counter
+    def timedIter(self, iterable, phase, counter=None):
+        if not self.enabled:
+            return iterable
+        return self.timeIteration(iter(iterable), phase, counter)
+
+    def timeIteration(self, iterator, phase, counter):
+        clock = time.time
+        elapsed = 0.0
+        items = 0
+        try:
+            while True:
+                start = clock()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                elapsed += clock() - start
+                items += 1
+                yield item
+        finally:
+            self.addTime(phase, elapsed)
+            if counter:
+                self.count(counter, items)
+
+    # Wrap function so its calls add to phase.  The total is kept without locking, so the wrapper must only be called from one thread
+    def timedCall(self, function, phase):
+        if not self.enabled:
+            return function
+        clock = time.time
+        cell = [0.0]
+        self.lock.acquire()
+        try:
+            self.cells.setdefault(phase, []).append(cell)
+        finally:
+            self.lock.release()
+
+        def timed(*args):
+            start = clock()
+            try:
+                return function(*args)
+            finally:
+                cell[0] += clock() - start
+        return timed
+
+    # Like timedCall, but only times one call in sampleEvery and counts it sampleEvery times.  For functions called for
+    # every line, where reading the clock twice per call would cost about as much as the call itself
+    def sampledCall(self, function, phase, sampleEvery=64):
+        if not self.enabled:
+            return function
+        clock = time.time
+        cell = [0.0]
+        calls = [0]
+        self.lock.acquire()
+        try:
+            self.cells.setdefault(phase, []).append(cell)
+        finally:
+            self.lock.release()
+
+        def sampled(*args):
+            calls[0] += 1
+            if calls[0] < sampleEvery:
+                return function(*args)
+            calls[0] = 0
+            start = clock()
+            try:
+                return function(*args)
+            finally:
+                cell[0] += (clock() - start) * sampleEvery
+        return sampled
+
+    # Seconds per phase.  The line parser is timed as a whole, so 'build' is what remains after reading and tokenizing
+    def phaseTimes(self):
+        self.lock.acquire()
+        try:
+            times = dict(self.timers)
+            for phase, cells in self.cells.items():
+                times[phase] = times.get(phase, 0.0) + sum([cell[0] for cell in cells])
+        finally:
+            self.lock.release()
+        if 'parse' in times:
+            times['build'] = times.get('build', 0.0) + max(0.0, times.pop('parse') - times.get('read', 0.0) - times.get('tokenize', 0.0))
+        return times
+
+    # Add phase times and counters exported by another Metrics, e.g. from a worker process
+    def merge(self, data):
+        if not self.enabled:
+            return
+        for phase, seconds in data['phases'].items():
+            self.addTime(phase, seconds)
+        for name, amount in data['counters'].items():
+            self.count(name, amount)
+
+    def toDict(self):
+        self.lock.acquire()
+        try:
+            counters = dict(self.counters)
+            latencies = {}
+            for host, latency in self.latencies.items():
+                latencies[host] = dict(latency, counts=list(latency['counts']))
+        finally:
+            self.lock.release()
+        return {
+            'enabled': self.enabled,
+            'phases': self.phaseTimes(),
+            'counters': counters,
+            'latencyBucketsMs': list(LATENCY_BUCKETS_MS),
+            'latency': latencies,
+        }
+
+    def toJson(self):
+        return json.dumps(self.toDict(), indent=2, sort_keys=True)
+
+    # Human readable lines for the extension's text area and the command line
+    def report(self):
+        if not self.enabled:
+            return []
+        lines = []
+        data = self.toDict()
+        times = data['phases']
+        names = [phase for phase in PHASES if phase in times] + sorted([phase for phase in times if phase not in PHASES])
+        if names:
+            lines.append('Time per phase (s):')
+            for phase in names:
+                lines.append('    %s  %.3f' % (phase, times[phase]))
+        counters = data['counters']
+        if counters:
+            lines.append('Counters:')
+            for name in sorted(counters):
+                lines.append('    %s  %d' % (name, counters[name]))
+        for host in sorted(data['latency']):
+            latency = data['latency'][host]
+            lines.append('Probe latency %s: %d requests, mean %.0f ms, max %.0f ms' % (host, latency['count'],
+                         latency['totalSeconds'] * 1000 / latency['count'], latency['maxSeconds'] * 1000))
+            buckets = []
+            for i in range(len(latency['counts'])):
+                if latency['counts'][i]:
+                    if i < len(LATENCY_BUCKETS_MS):
+                        buckets.append('<=%dms: %d' % (LATENCY_BUCKETS_MS[i], latency['counts'][i]))
+                    else:
+                        buckets.append('>%dms: %d' % (LATENCY_BUCKETS_MS[-1], latency['counts'][i]))
+            lines.append('    ' + ', '.join(buckets))
+        return lines
@@ -0,0 +1,281 @@
+"""
+Compact URL store used by the Directory and File Listing Parser.
+
+Directories are kept in a trie of path segments below one root per protocol/host/port, so a directory shared by
+thousands of files is stored once and repeated directory names are interned.  Each URL is then just an index
+to its directory plus the last path segment.  The last segments are not kept as separate strings but encoded one
+after the other in a single byte buffer with an array of end offsets, and duplicates are found through an open
+addressing hash table held in an array of entry indexes, so an entry costs the length of its name plus about 50
+bytes.  Adding a URL that is already stored is a no-op, and full URL strings are only built again when the store is
+read.  The size, date and directory flag given by the listing are kept in parallel arrays, with -1 for an unknown
+size.  directoryCount and fileCount follow the directory flag, and only fall back to a trailing '/' for entries
+whose type the listing does not give.
+"""
+
+import sys
+from array import array
+
+try:
+    intern
+except NameError:
+    from sys import intern
+
+try:
+    xrange
+except NameError:
+    xrange = range
+
+# 64 bit sizes, as 'q' is missing from older array modules where 'l' is 64 bit on the platforms concerned
+try:
+    array('q')
+    SIZE_TYPECODE = 'q'
+except ValueError:
+    SIZE_TYPECODE = 'l'
+
+# Names are stored as UTF-8 under Python 3, keeping undecodable bytes as the listing reader does.  Python 2 strings are already bytes
+if sys.version_info[0] >= 3:
+    def encodeName(name):
+        return name.encode('utf-8', 'surrogateescape')
+
+    def decodeName(data):
+        return data.decode('utf-8', 'surrogateescape')
+else:
+    def encodeName(name):
+        if isinstance(name, unicode):
+            return name.encode('utf-8')
+        return name
+
+    def decodeName(data):
+        return str(data)
+
+# Slots of the hash table when the store is empty.  The table is doubled whenever it becomes half full
+INITIAL_TABLE_SIZE = 1024
+
+# Values of the directory flag
+UNKNOWN, FILE, DIRECTORY = -1, 0, 1
+
+# Passed to add() instead of a flag for a directory header, which only marks an already stored URL as a directory
+DIRECTORY_HEADER = 2
+
+
+# Split a URL into its protocol/host/port part and the list of path segments after it
+def splitUrl(url):
+    schemeEnd = url.find('://')
+    pathStart = url.find('/', schemeEnd + 3 if schemeEnd >= 0 else 0)
+    if pathStart < 0:
+        return url, ()
+    return url[:pathStart], url[pathStart + 1:].split('/')
+
+
+# One directory.  The root node of each tree holds the protocol/host/port part of the URL as its segment
+class PathNode(object):
+    __slots__ = ('parent', 'segment', 'index', 'children')
+
+    def __init__(self, parent, segment, index):
+        self.parent = parent
+        self.segment = segment
+        self.index = index
+        # Subdirectory nodes by segment
+        self.children = None
+
+
+# Deduplicating list of URLs in insertion order.  Supports len(), indexing and iteration like the plain list it replaces
+class PathStore(object):
+    def __init__(self):
+        self.roots = {}
+        self.directories = []
+        self.entryDirectories = array('i')
+        # Encoded last segments of all entries back to back, with the offset where each one ends.  Entries of URLs
+        # without any path have an empty name and are listed in pathless
+        self.nameData = bytearray()
+        self.nameEnds = array(SIZE_TYPECODE)
+        self.pathless = set()
+        # Hash of (directory, name) of each entry, and the table of entry index + 1 by hash, 0 marking a free slot
+        self.entryHashes = array(SIZE_TYPECODE)
+        self.table = array('i', [0]) * INITIAL_TABLE_SIZE
+        self.entryFlags = array('b')
+        self.entrySizes = array(SIZE_TYPECODE)
+        self.entryDates = []
+        self.directoryCount = 0
+        self.fileCount = 0
+
+    # Add a URL and return True, or return False if it was already stored, keeping the metadata of the first one.
+    # Adding a stored URL again as a DIRECTORY, or as a DIRECTORY_HEADER, marks it as one
+    def add(self, url, isDirectory=UNKNOWN, size=-1, date=None):
+        if isDirectory == DIRECTORY_HEADER:
+            index = self.index(url)
+            if index >= 0:
+                self.markDirectory(index)
+            return False
+        base, segments = splitUrl(url)
+        last = len(segments) - 1
+        node = self.directoryNode(base, segments, last)
+
+        # A URL without any path is stored with no last segment
+        if last >= 0:
+            name = segments[last]
+        else:
+            name = None
+        return self.addEntry(node.index, name, isDirectory, size, date)
+
+    # Store one entry unless its directory already holds the name
+    def addEntry(self, directory, name, isDirectory, size, date):
+        nameHash = hash((directory, name))
+        index, slot = self.find(directory, name, nameHash)
+        if index >= 0:
+            if isDirectory == DIRECTORY:
+                self.markDirectory(index)
+            return False
+        index = len(self.entryFlags)
+        self.table[slot] = index + 1
+        self.entryHashes.append(nameHash)
+        self.entryDirectories.append(directory)
+        if name is None:
+            self.pathless.add(index)
+        else:
+            self.nameData.extend(encodeName(name))
+        self.nameEnds.append(len(self.nameData))
+        self.entryFlags.append(isDirectory)
+        self.entrySizes.append(size)
+        self.entryDates.append(date)
+        if isDirectory == DIRECTORY or (isDirectory == UNKNOWN and name == ''):
+            self.directoryCount += 1
+        else:
+            self.fileCount += 1
+        if (index + 1) * 2 > len(self.table):
+            self.growTable()
+        return True
+
+    # Entry index of the name in the directory, or -1, with the table slot holding it or where it would go
+    def find(self, directory, name, nameHash):
+        table = self.table
+        mask = len(table) - 1
+        slot = nameHash & mask
+        while True:
+            entry = table[slot]
+            if not entry:
+                return -1, slot
+            entry -= 1
+            if self.entryHashes[entry] == nameHash and self.entryDirectories[entry] == directory and self.entryName(entry) == name:
+                return entry, slot
+            slot = (slot + 1) & mask
+
+    # Double the hash table and place every entry again from its stored hash
+    def growTable(self):
+        table = array('i', [0]) * (len(self.table) * 2)
+        mask = len(table) - 1
+        entryHashes = self.entryHashes
+        for index in xrange(len(entryHashes)):
+            slot = entryHashes[index] & mask
+            while table[slot]:
+                slot = (slot + 1) & mask
+            table[slot] = index + 1
+        self.table = table
+
+    # Last path segment of the entry at index, or None for a URL without a path
+    def entryName(self, index):
+        if index in self.pathless:
+            return None
+        if index:
+            start = self.nameEnds[index - 1]
+        else:
+            start = 0
+        return decodeName(self.nameData[start:self.nameEnds[index]])
+
+    # Flag the entry at index as a directory, moving it from fileCount to directoryCount if it was counted as a file
+    def markDirectory(self, index):
+        flag = self.entryFlags[index]
+        if flag == DIRECTORY:
+            return
+        if flag == FILE or self.entryName(index) != '':
+            self.fileCount -= 1
+            self.directoryCount += 1
+        self.entryFlags[index] = DIRECTORY
+
+    # Add the entries of one directory, given as its URL without the trailing '/' and parallel sequences of names, directory
+    # flags, sizes and dates.  A generator yielding the full URL of each new entry as soon as it is stored.  The trie is only
+    # walked once for the whole directory, which is what makes merging the chunks of a parallel parse cheap
+    def addDirectory(self, directoryUrl, names, flags, sizes, dates):
+        base, segments = splitUrl(directoryUrl)
+        directory = self.directoryNode(base, segments, len(segments)).index
+        urlPrefix = directoryUrl + '/'
+        for i in xrange(len(names)):
+            name = names[i]
+            isDirectory = flags[i]
+            if isDirectory == DIRECTORY_HEADER:
+                index = self.find(directory, name, hash((directory, name)))[0]
+                if index >= 0:
+                    self.markDirectory(index)
+            elif self.addEntry(directory, name, isDirectory, sizes[i], dates[i]):
+                yield urlPrefix + name
+
+    # Node of the directory holding the first count path segments, created along with its parents if missing
+    def directoryNode(self, base, segments, count):
+        node = self.roots.get(base)
+        if node is None:
+            node = self.roots[base] = self.newNode(None, base)
+        for i in range(count):
+            children = node.children
+            if children is None:
+                children = node.children = {}
+            child = children.get(segments[i])
+            if child is None:
+                child = children[segments[i]] = self.newNode(node, intern(segments[i]))
+            node = child
+        return node
+
+    def newNode(self, parent, segment):
+        node = PathNode(parent, segment, len(self.directories))
+        self.directories.append(node)
+        return node
+
+    # Build the full URL of the entry at index by walking up from its directory to the root
+    def url(self, index):
+        name = self.entryName(index)
+        node = self.directories[self.entryDirectories[index]]
+        if name is None:
+            segments = []
+        else:
+            segments = [name]
+        while node is not None:
+            segments.append(node.segment)
+            node = node.parent
+        segments.reverse()
+        return '/'.join(segments)
+
+    # Directory flag, size and date of the entry at index, as given by the listing
+    def metadata(self, index):
+        return self.entryFlags[index], self.entrySizes[index], self.entryDates[index]
+
+    # Index of a stored URL, or -1
+    def index(self, url):
+        base, segments = splitUrl(url)
+        node = self.roots.get(base)
+        for i in range(len(segments) - 1):
+            if node is None or node.children is None:
+                return -1
+            node = node.children.get(segments[i])
+        if node is None:
+            return -1
+        if segments:
+            name = segments[-1]
+        else:
+            name = None
+        return self.find(node.index, name, hash((node.index, name)))[0]
+
+    def __len__(self):
+        return len(self.entryFlags)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.entryFlags)
+        if not 0 <= index < len(self.entryFlags):
+            raise IndexError('PathStore index out of range')
+        return self.url(index)
+
+    def __iter__(self):
+        for index in xrange(len(self.entryFlags)):
+            yield self.url(index)
+
+    def __contains__(self, url):
+        return self.index(url) >= 0
@@ -0,0 +1,147 @@
+"""
+On-disk cache of probe results shared by site map imports, so re-importing an overlapping listing for the same host
+does not send every request again.
+
+Entries are keyed by the URL without its fragment, which holds the protocol, host, port and path, and keep the
+status code, content length, ETag and Last-Modified of the last response.  An entry younger than the TTL answers
+the probe without any request.  An older one is revalidated with If-None-Match / If-Modified-Since when it has a
+validator, and dropped otherwise.  The cache holds at most maxEntries URLs, evicting the least recently used ones,
+and is read when an import starts and written back when it ends.
+"""
+
+import os, threading, time
+from collections import OrderedDict
+from probe_journal import openJournal
+
+DEFAULT_TTL = 24 * 3600
+DEFAULT_MAX_ENTRIES = 1000000
+
+
+# Content length, ETag and Last-Modified of a response from its header lines.  For a partial response the length is the full size from Content-Range
+def responseValidators(headers):
+    length = -1
+    etag = lastModified = ''
+    for header in headers:
+        name, separator, value = header.partition(':')
+        if not separator:
+            continue
+        name = name.strip().lower()
+        value = value.strip().replace('\t', ' ')
+        if name == 'content-length' and value.isdigit() and length < 0:
+            length = int(value)
+        elif name == 'content-range' and value.rpartition('/')[2].isdigit():
+            length = int(value.rpartition('/')[2])
+        elif name == 'etag':
+            etag = value
+        elif name == 'last-modified':
+            lastModified = value
+    return length, etag, lastModified
+
+
+class ProbeCache:
+    def __init__(self, path, ttl=DEFAULT_TTL, maxEntries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.maxEntries = maxEntries
+        # URL to [status, content length, ETag, Last-Modified, time stored], least recently used first
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.revalidated = 0
+
+    # Read the cache file, skipping malformed lines such as a torn last line
+    def load(self):
+        self.entries.clear()
+        if not os.path.isfile(self.path):
+            return
+        f = openJournal(self.path, 'r')
+        try:
+            for line in f:
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) != 6 or not fields[1].isdigit():
+                    continue
+                url, status, length, etag, lastModified, stored = fields
+                try:
+                    self.entries[url] = [int(status), int(length), etag, lastModified, float(stored)]
+                except ValueError:
+                    continue
+        finally:
+            f.close()
+        self.evict()
+
+    # Write the cache to a temporary file and move it over the old one, so a crash never leaves a half written cache
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        temporary = self.path + '.tmp'
+        f = openJournal(temporary, 'w')
+        try:
+            for url, entry in self.entries.items():
+                f.write('%s\t%d\t%d\t%s\t%s\t%.0f\n' % (url, entry[0], entry[1], entry[2], entry[3], entry[4]))
+        finally:
+            f.close()
+        # os.rename does not replace an existing file on Windows
+        if os.path.exists(self.path) and os.name == 'nt':
+            os.remove(self.path)
+        os.rename(temporary, self.path)
+
+    # Return (status, fresh) for a cached URL, or None.  A stale entry without a validator is dropped and returns None
+    def lookup(self, url):
+        self.lock.acquire()
+        try:
+            entry = self.entries.pop(url, None)
+            if entry is None:
+                return None
+            fresh = time.time() - entry[4] < self.ttl
+            if not fresh and not entry[2] and not entry[3]:
+                return None
+            self.entries[url] = entry
+            return entry[0], fresh
+        finally:
+            self.lock.release()
+
+    # Count a probe answered from a fresh entry without a request
+    def countHit(self):
+        self.lock.acquire()
+        try:
+            self.hits += 1
+        finally:
+            self.lock.release()
+
+    # Request header lines asking the server to answer 304 if the cached response is still current
+    def conditionalHeaders(self, url):
+        self.lock.acquire()
+        try:
+            entry = self.entries.get(url)
+        finally:
+            self.lock.release()
+        headers = []
+        if entry is not None:
+            if entry[2]:
+                headers.append('If-None-Match: ' + entry[2])
+            if entry[3]:
+                headers.append('If-Modified-Since: ' + entry[3])
+        return headers
+
+    # Record a response.  A 304 renews the cached entry and returns its status, any other status replaces it and is returned as is
+    def store(self, url, status, headers):
+        self.lock.acquire()
+        try:
+            entry = self.entries.pop(url, None)
+            if status == 304 and entry is not None:
+                entry[4] = time.time()
+                self.revalidated += 1
+            else:
+                length, etag, lastModified = responseValidators(headers)
+                entry = [status, length, etag, lastModified, time.time()]
+            self.entries[url] = entry
+            self.evict()
+            return entry[0]
+        finally:
+            self.lock.release()
+
+    # Drop the least recently used entries above maxEntries
+    def evict(self):
+        while len(self.entries) > self.maxEntries:
+            self.entries.popitem(last=False)
@@ -0,0 +1,167 @@
+"""
+Probing engine used by the Directory and File Listing Parser and Burp Site Map Importer.
+
+Requests are spread over a pool of worker threads with a per-host rate cap, while results are handed back
+one at a time and in the original URL order so callers can add them to Burp's site map without extra locking.
+The engine only needs a probe function, so it runs the same under Jython inside Burp and under CPython.
+"""
+
+import sys, threading, time
+
+try:
+    from Queue import Queue
+except ImportError:
+    from queue import Queue
+
+try:
+    from urlparse import urlsplit
+except ImportError:
+    from urllib.parse import urlsplit
+
+
+# Spaces out requests so that no single host receives more than maxPerSecond requests per second
+class HostRateLimiter:
+    def __init__(self, maxPerSecond):
+        if maxPerSecond > 0:
+            self.interval = 1.0 / maxPerSecond
+        else:
+            self.interval = 0
+        self.nextSlot = {}
+        self.lock = threading.Lock()
+
+    # Block until the host may receive another request.  Returns early if the cancelled event is set
+    def wait(self, host, cancelled):
+        if not self.interval:
+            return
+        self.lock.acquire()
+        try:
+            now = time.time()
+            slot = max(now, self.nextSlot.get(host, now))
+            self.nextSlot[host] = slot + self.interval
+        finally:
+            self.lock.release()
+        if slot > now:
+            cancelled.wait(slot - now)
+
+
+# Raised by ProbeEngine.throttle when the run is stopped while a request waits for its slot
+class ProbeCancelled(Exception):
+    pass
+
+
+# Probe a list of URLs with a pool of worker threads.
+#   probe(url, timeout) makes the request and returns a result, raising an exception on failure.
+#   With throttledProbe set, probe calls throttle(url) before each request it sends, so a probe sending several
+#   requests for one URL still keeps to the per-host cap.  Otherwise the engine takes one slot per URL for it.
+#   consume(url, result) is called for every successful probe, in URL order and always from the thread calling run().
+#   error(url, exception) is called for failed probes, also in URL order from the thread calling run().
+#   progress(done, total) is called from the thread calling run() after each URL is handed back.
+class ProbeEngine:
+    def __init__(self, probe, consume, error=None, progress=None, concurrency=8, maxPerSecond=0, timeout=10, throttledProbe=False):
+        self.probe = probe
+        self.throttledProbe = throttledProbe
+        self.consume = consume
+        self.error = error
+        self.progress = progress
+        self.concurrency = max(1, int(concurrency))
+        self.timeout = timeout
+        self.rateLimiter = HostRateLimiter(maxPerSecond)
+        self.cancelled = threading.Event()
+        # Set when the current run ends, to release its feeder and workers.  A new engine run gets a new event
+        self.stopped = threading.Event()
+        self.done = 0
+        self.failed = 0
+
+    # Stop handing out URLs, for this run and any later one.  Requests already in flight are allowed to finish but their results are dropped
+    def cancel(self):
+        self.cancelled.set()
+        self.stopped.set()
+
+    def isCancelled(self):
+        return self.cancelled.isSet()
+
+    # Block until the URL's host may receive another request.  Called from the probe function on a worker thread
+    def throttle(self, url):
+        stopped = self.stopped
+        self.rateLimiter.wait(urlsplit(url)[1], stopped)
+        if stopped.isSet():
+            raise ProbeCancelled('Import cancelled before requesting ' + url)
+
+    # Probe the URLs and return how many were handed back.  May be called again for further URLs, e.g. one directory level at a time
+    def run(self, urls):
+        total = len(urls)
+        self.done = 0
+        self.failed = 0
+        if self.isCancelled():
+            return 0
+        stopped = self.stopped = threading.Event()
+        # Bounded so the feeder never gets far ahead of the workers on huge lists
+        tasks = Queue(self.concurrency * 4)
+        results = Queue()
+
+        feeder = threading.Thread(target=self.feed, args=(urls, tasks, stopped))
+        feeder.daemon = True
+        feeder.start()
+        for i in range(self.concurrency):
+            worker = threading.Thread(target=self.work, args=(tasks, results, stopped))
+            worker.daemon = True
+            worker.start()
+
+        # Results arrive in completion order.  Hold them back until every earlier URL has been handed back
+        pending = {}
+        nextIndex = 0
+        finishedWorkers = 0
+        try:
+            while nextIndex < total and finishedWorkers < self.concurrency and not self.isCancelled():
+                item = results.get()
+                if item is None:
+                    finishedWorkers += 1
+                    continue
+                pending[item[0]] = item
+                # A cancel from consume, error or progress also stops results that have already arrived from being handed back
+                while nextIndex in pending and not self.isCancelled():
+                    index, url, result, exception = pending.pop(nextIndex)
+                    nextIndex += 1
+                    if exception is None:
+                        self.consume(url, result)
+                    else:
+                        self.failed += 1
+                        if self.error:
+                            self.error(url, exception)
+                    self.done = nextIndex
+                    if self.progress:
+                        self.progress(self.done, total)
+        finally:
+            # Release the feeder and any idle workers
+            stopped.set()
+        return self.done
+
+    def feed(self, urls, tasks, stopped):
+        for index in range(len(urls)):
+            if stopped.isSet():
+                break
+            tasks.put((index, urls[index]))
+        for i in range(self.concurrency):
+            tasks.put(None)
+
+    def work(self, tasks, results, stopped):
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            # Keep draining after a cancel so the feeder is never left blocked on a full queue
+            if stopped.isSet():
+                continue
+            index, url = task
+            if not self.throttledProbe:
+                self.rateLimiter.wait(urlsplit(url)[1], stopped)
+                if stopped.isSet():
+                    continue
+            # Bare except so Java exceptions raised under Jython are reported instead of killing the worker
+            try:
+                result = self.probe(url, self.timeout)
+            except:
+                results.put((index, url, None, sys.exc_info()[1]))
+            else:
+                results.put((index, url, result, None))
+        results.put(None)
@@ -0,0 +1,104 @@
+"""
+Append-only journal of probed URLs used to resume an interrupted site map import.
+
+Each line holds the status code and URL of one probe, separated by a tab.  Writes are buffered and only flushed
+and fsynced every syncEvery records or syncInterval seconds, so the journal does not slow down the import while
+a crash loses at most the last batch, which is simply probed again on resume.
+"""
+
+import os, sys, time
+
+
+# Journal files are UTF-8, keeping any undecodable bytes of listing file names as they were under Python 3
+def openJournal(path, mode):
+    if sys.version_info[0] >= 3:
+        return open(path, mode, encoding='utf-8', errors='surrogateescape')
+    return open(path, mode)
+
+
+class ProbeJournal:
+    def __init__(self, path, syncEvery=500, syncInterval=2.0):
+        self.path = path
+        self.syncEvery = syncEvery
+        self.syncInterval = syncInterval
+        self.file = None
+        self.pending = 0
+        self.lastSync = time.time()
+
+    # Status codes of the URLs already in the journal.  A torn last line left by a crash is ignored
+    def load(self):
+        done = {}
+        if not os.path.isfile(self.path):
+            return done
+        f = openJournal(self.path, 'r')
+        try:
+            for line in f:
+                if not line.endswith('\n'):
+                    break
+                status, separator, url = line[:-1].partition('\t')
+                if separator and status.isdigit():
+                    done[url] = int(status)
+        finally:
+            f.close()
+        return done
+
+    # Open the journal for appending, or start a new one when resume is False
+    def open(self, resume=True):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        if resume:
+            self.dropTornLine()
+            self.file = openJournal(self.path, 'a')
+        else:
+            self.file = openJournal(self.path, 'w')
+        self.pending = 0
+        self.lastSync = time.time()
+
+    # Cut off a last line left incomplete by a crash, so new records do not get glued to it
+    def dropTornLine(self):
+        if not os.path.isfile(self.path):
+            return
+        f = open(self.path, 'rb+')
+        try:
+            f.seek(0, 2)
+            end = f.tell()
+            position = end
+            while position > 0:
+                step = min(position, 65536)
+                f.seek(position - step)
+                newline = f.read(step).rfind(b'\n')
+                if newline >= 0:
+                    position = position - step + newline + 1
+                    break
+                position -= step
+            if position < end:
+                f.truncate(position)
+        finally:
+            f.close()
+
+    def record(self, url, status):
+        self.file.write(str(status) + '\t' + url + '\n')
+        self.pending += 1
+        if self.pending >= self.syncEvery or time.time() - self.lastSync >= self.syncInterval:
+            self.sync()
+
+    # Push buffered records to disk
+    def sync(self):
+        if self.file and self.pending:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        self.pending = 0
+        self.lastSync = time.time()
+
+    def close(self):
+        if self.file:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+    # Delete the journal of an import that ran to the end, so the next import does not mistake it for an interrupted one
+    def remove(self):
+        self.close()
+        if os.path.isfile(self.path):
+            os.remove(self.path)
@@ -0,0 +1,102 @@
+"""
+Breadth-first probing order for the site map import.
+
+URLs are probed one directory level at a time, so a directory is always probed before anything below it.  When a
+directory answers with one of the prune status codes (404 by default, 401 or 403 to also skip paths behind a
+blocked directory), every URL below it is skipped, except for up to sampleSize sampled URLs per pruned directory.
+A sample answering with any other status shows the directory only hides its contents, and lifts the pruning for
+the levels that have not been scheduled yet.
+"""
+
+from array import array
+
+try:
+    xrange
+except NameError:
+    xrange = range
+
+DEFAULT_PRUNE_STATUSES = (404,)
+
+
+# Parse a comma separated list of status codes, raising ValueError for anything that is not a number
+def parseStatuses(text):
+    statuses = []
+    for status in text.split(','):
+        status = status.strip()
+        if status:
+            statuses.append(int(status))
+    return tuple(statuses)
+
+
+# Index of the '/' starting the path of a URL, or -1 for a URL without a path
+def pathStart(url):
+    schemeEnd = url.find('://')
+    return url.find('/', schemeEnd + 3 if schemeEnd >= 0 else 0)
+
+
+class TreeScheduler:
+    def __init__(self, urls, pruneStatuses=DEFAULT_PRUNE_STATUSES, sampleSize=0):
+        self.urls = urls
+        self.pruneStatuses = frozenset(pruneStatuses)
+        self.sampleSize = sampleSize
+        # Indexes into urls for each directory level, in listing order.  Kept as indexes so a PathStore is not expanded up front
+        self.levels = []
+        for index in xrange(len(urls)):
+            url = urls[index]
+            start = pathStart(url)
+            if start < 0:
+                depth = 0
+            else:
+                depth = url.count('/', start + 1, len(url) - 1)
+            while len(self.levels) <= depth:
+                self.levels.append(array('i'))
+            self.levels[depth].append(index)
+        # Pruned directory URLs, with the number of samples let through below each one
+        self.pruned = {}
+        self.samples = {}
+        self.prunedDirectories = 0
+        self.prunedUrls = 0
+        self.sampledUrls = 0
+        self.unprunedDirectories = 0
+
+    # The URLs to probe, one list per directory level.  Each level is only built once the previous one has been probed
+    def waves(self):
+        for level in self.levels:
+            wave = []
+            for index in level:
+                url = self.urls[index]
+                if self.allows(url):
+                    wave.append(url)
+            if wave:
+                yield wave
+
+    # False if the URL is below a pruned directory and not taken as a sample
+    def allows(self, url):
+        if not self.pruned:
+            return True
+        start = pathStart(url)
+        if start < 0:
+            return True
+        slash = url.find('/', start + 1)
+        while 0 <= slash < len(url) - 1:
+            directory = url[:slash + 1]
+            if directory in self.pruned:
+                if self.pruned[directory] < self.sampleSize:
+                    self.pruned[directory] += 1
+                    self.samples[url] = directory
+                    self.sampledUrls += 1
+                    return True
+                self.prunedUrls += 1
+                return False
+            slash = url.find('/', slash + 1)
+        return True
+
+    # Called with the status code of every probed URL, including the ones loaded from an import journal
+    def record(self, url, status):
+        directory = self.samples.pop(url, None)
+        if directory is not None and status not in self.pruneStatuses and directory in self.pruned:
+            del self.pruned[directory]
+            self.unprunedDirectories += 1
+        elif url.endswith('/') and status in self.pruneStatuses and url not in self.pruned:
+            self.pruned[url] = 0
+            self.prunedDirectories += 1
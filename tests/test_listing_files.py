@@ -0,0 +1,143 @@
+"""
+Tests for opening compressed listings and tar archives of listings, and for the errors raised by corrupt ones.
+
+    python -m pytest tests
+"""
+
+import bz2, gzip, io, os, shutil, sys, tarfile, tempfile, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from listing_files import LISTING_READ_ERRORS, detectCompression, isPlainListing, listingStreams, lzma
+from listing_parser import DEFAULT_DIR_PREFIX, ListingParser, ListingParserError
+
+LISTING = b'.:\nadmin  index.html\n\n./admin:\nconfig.php\n'
+
+OTHER_LISTING = b'.:\nlogin.php\n'
+
+URLS = ['http://www.example.com:80/admin/', 'http://www.example.com:80/index.html', 'http://www.example.com:80/admin/config.php']
+
+
+class ListingFilesTest(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix='listing-files-test-')
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def writeFile(self, name, data):
+        filename = os.path.join(self.workdir, name)
+        f = open(filename, 'wb')
+        try:
+            f.write(data)
+        finally:
+            f.close()
+        return filename
+
+    def gzipped(self, data):
+        buffer = io.BytesIO()
+        f = gzip.GzipFile('listing.txt', 'wb', fileobj=buffer)
+        try:
+            f.write(data)
+        finally:
+            f.close()
+        return buffer.getvalue()
+
+    def writeTar(self, name, mode, members):
+        filename = os.path.join(self.workdir, name)
+        archive = tarfile.open(filename, mode)
+        try:
+            directory = tarfile.TarInfo('listings')
+            directory.type = tarfile.DIRTYPE
+            archive.addfile(directory)
+            for memberName, data in members:
+                member = tarfile.TarInfo(memberName)
+                member.size = len(data)
+                archive.addfile(member, io.BytesIO(data))
+        finally:
+            archive.close()
+        return filename
+
+    # (name, text) of each listing in the file, read the way the parser reads them
+    def readStreams(self, filename):
+        return [(name, ''.join(f)) for name, f in listingStreams(filename)]
+
+    def parse(self, filename):
+        parser = ListingParser()
+        return list(parser.iterUrls('www.example.com', DEFAULT_DIR_PREFIX, 'http://', '80', 'ls-R', filename))
+
+    def testPlain(self):
+        filename = self.writeFile('listing.txt', LISTING)
+        self.assertEqual(detectCompression(filename), None)
+        self.assertTrue(isPlainListing(filename))
+        self.assertEqual(self.readStreams(filename), [(filename, LISTING.decode('ascii'))])
+
+    # Compression is recognised from the content, whatever the file is called
+    def testGzip(self):
+        filename = self.writeFile('listing.txt', self.gzipped(LISTING))
+        self.assertEqual(detectCompression(filename), 'gzip')
+        self.assertFalse(isPlainListing(filename))
+        self.assertEqual(self.readStreams(filename), [(filename, LISTING.decode('ascii'))])
+        self.assertEqual(self.parse(filename), URLS)
+
+    def testBzip2(self):
+        filename = self.writeFile('listing.bz2', bz2.compress(LISTING))
+        self.assertEqual(detectCompression(filename), 'bzip2')
+        self.assertEqual(self.parse(filename), URLS)
+
+    @unittest.skipIf(lzma is None, 'needs the lzma module')
+    def testXz(self):
+        filename = self.writeFile('listing.xz', lzma.compress(LISTING))
+        self.assertEqual(detectCompression(filename), 'xz')
+        self.assertEqual(self.parse(filename), URLS)
+
+    # Regular members are listings of their own, directories are skipped
+    def testTar(self):
+        for name, mode in (('listings.tar', 'w'), ('listings.tgz', 'w:gz'), ('listings.tbz2', 'w:bz2')):
+            filename = self.writeTar(name, mode, [('listings/a.txt', LISTING), ('listings/b.txt', OTHER_LISTING)])
+            self.assertFalse(isPlainListing(filename))
+            self.assertEqual(self.readStreams(filename), [(filename + '/listings/a.txt', LISTING.decode('ascii')),
+                                                          (filename + '/listings/b.txt', OTHER_LISTING.decode('ascii'))])
+            self.assertEqual(self.parse(filename), URLS + ['http://www.example.com:80/login.php'])
+
+    # A byte order mark is looked for after decompression, and such a listing is never split for parallel parsing
+    def testUtf16(self):
+        data = LISTING.decode('ascii').replace(u'\n', u'\r\n').encode('utf-16')
+        for filename in (self.writeFile('listing.txt', data), self.writeFile('listing.gz', self.gzipped(data))):
+            self.assertFalse(isPlainListing(filename))
+            self.assertEqual(self.parse(filename), URLS)
+
+    def testTruncatedGzip(self):
+        data = self.gzipped(LISTING * 50)
+        filename = self.writeFile('listing.gz', data[:len(data) // 2])
+        self.assertRaises(ListingParserError, self.parse, filename)
+
+    def testCorruptGzip(self):
+        filename = self.writeFile('listing.gz', b'\x1f\x8b\x08\x00' + b'\xff' * 64)
+        self.assertRaises(ListingParserError, self.parse, filename)
+
+    def testCorruptBzip2(self):
+        filename = self.writeFile('listing.bz2', b'BZh9' + b'\x00' * 64)
+        self.assertRaises(ListingParserError, self.parse, filename)
+
+    # Fails to decompress with lzma, and without it any xz listing is refused instead of being parsed as garbage
+    def testCorruptXz(self):
+        filename = self.writeFile('listing.xz', b'\xfd7zXZ\x00' + b'\x00' * 64)
+        self.assertRaises(ListingParserError, self.parse, filename)
+
+    def testTruncatedTar(self):
+        filename = self.writeTar('listings.tar', 'w', [('listings/a.txt', LISTING * 200)])
+        f = open(filename, 'rb')
+        try:
+            data = f.read()
+        finally:
+            f.close()
+        filename = self.writeFile('truncated.tar', data[:1024])
+        self.assertRaises(ListingParserError, self.parse, filename)
+
+    @unittest.skipIf(lzma is None, 'needs the lzma module')
+    def testReadErrorsIncludeLzma(self):
+        self.assertTrue(lzma.LZMAError in LISTING_READ_ERRORS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Regression tests for the Directory and File Listing Parser.
+
+Each listing format is parsed from a small fixed listing and the exact list of URLs is checked.  The 'dir /s',
+'ls -lR' and 'ls -R' expectations are the output of the original parser for the same listings.
+
+    python -m pytest tests
+"""
+
+import io, os, shutil, sys, tempfile, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from listing_parser import DEFAULT_DIR_PREFIX, ListingParser, ListingParserError, multiprocessing
+from metrics import Metrics
+from url_filter import UrlFilter, parseRules
+
+WINDOWS_PREFIX = 'C:\\inetpub\\wwwroot'
+
+DIR_LISTING = u''' Volume in drive C has no label.
+ Volume Serial Number is 1234-ABCD
+
+ Directory of C:\\inetpub\\wwwroot
+
+01/15/2013  10:22 AM    <DIR>          .
+01/15/2013  10:22 AM    <DIR>          ..
+01/15/2013  10:22 AM    <DIR>          admin
+01/10/2013  09:01 AM             1,024 index.html
+01/10/2013  09:01 AM               512 logout.aspx
+01/10/2013  09:01 AM               300 my file.txt
+               3 File(s)          1,836 bytes
+
+ Directory of C:\\inetpub\\wwwroot\\admin
+
+01/15/2013  10:22 AM    <DIR>          .
+01/15/2013  10:22 AM    <DIR>          ..
+01/12/2013  08:00 AM             2,048 web.config
+               1 File(s)          2,048 bytes
+'''
+
+POWERSHELL_LISTING = u'''
+
+    Directory: C:\\inetpub\\wwwroot
+
+
+Mode                 LastWriteTime         Length Name
+----                 -------------         ------ ----
+d-----         1/15/2013  10:22 AM                admin
+-a----         1/10/2013   9:01 AM           1024 index.html
+-a----         1/10/2013   9:01 AM            512 logoff.aspx
+-a----         1/10/2013   9:01 AM            300 my file.txt
+
+
+    Directory: C:\\inetpub\\wwwroot\\admin
+
+
+Mode                 LastWriteTime         Length Name
+----                 -------------         ------ ----
+-a----         1/12/2013   8:00 AM           2048 web.config
+'''
+
+LS_LR_LISTING = u'''.:
+total 16
+drwxr-xr-x 3 www www 4096 Jan 15 10:22 admin
+-rw-r--r-- 1 www www 1024 Jan 10 09:01 index.html
+-rw-r--r-- 1 www www  300 Jan 10 09:01 'my file.txt'
+-rw-r--r-- 1 www www  512 Jan 10 09:01 signout.php
+
+./admin:
+total 8
+-rw-r--r-- 1 www www 2048 Jan 12 08:00 config.php
+drwxr-xr-x 2 www www 4096 Jan 12 08:00 old
+
+./admin/old:
+total 4
+-rw-r--r-- 1 www www   10 Jan 12  2012 backup.zip
+'''
+
+LS_R_LISTING = u'''.:
+admin  index.html  'my file.txt'  signout.php
+
+./admin:
+config.php  old
+
+./admin/old:
+backup.zip
+'''
+
+FIND_LISTING = u'''.
+./admin
+./admin/config.php
+./admin/old
+./admin/old/backup.zip
+./index.html
+./my file.txt
+'''
+
+ABSOLUTE_FIND_LISTING = u'''/var/www
+/var/www/admin
+/var/www/admin/config.php
+/var/www/index.html
+/var/log/messages
+'''
+
+TREE_LISTING = u'''.
+├── admin
+│   ├── config.php
+│   └── old
+│       └── backup.zip
+├── index.html
+└── my file.txt
+
+2 directories, 4 files
+'''
+
+URL_BASE = 'http://www.example.com:80'
+
+
+class ListingParserTest(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix='listing-test-')
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def writeListing(self, text, encoding='utf-8'):
+        filename = os.path.join(self.workdir, 'listing.txt')
+        f = io.open(filename, 'w', encoding=encoding)
+        try:
+            f.write(text)
+        finally:
+            f.close()
+        return filename
+
+    def parse(self, text, listing, prefix=DEFAULT_DIR_PREFIX, encoding='utf-8'):
+        parser = ListingParser()
+        return list(parser.iterUrls('www.example.com', prefix, 'http://', '80', listing, self.writeListing(text, encoding)))
+
+    def assertUrls(self, urls, paths):
+        self.assertEqual(urls, [URL_BASE + path for path in paths])
+
+    def testWindowsDir(self):
+        self.assertUrls(self.parse(DIR_LISTING, 'windows', WINDOWS_PREFIX),
+                        ['/admin/', '/index.html', '/my file.txt', '/admin/web.config'])
+
+    # Before the PowerShell parser existed these tables went through the 'dir /s' parser, which skips directories
+    def testPowerShellAsWindowsDir(self):
+        self.assertUrls(self.parse(POWERSHELL_LISTING, 'windows', WINDOWS_PREFIX),
+                        ['/index.html', '/my file.txt', '/admin/web.config'])
+
+    def testPowerShell(self):
+        self.assertUrls(self.parse(POWERSHELL_LISTING, 'powershell', WINDOWS_PREFIX),
+                        ['/admin/', '/index.html', '/my file.txt', '/admin/web.config'])
+
+    # PowerShell's '>' writes UTF-16 with a byte order mark, which is decoded whether the type is chosen or detected
+    def testPowerShellUtf16(self):
+        for text, encoding in ((POWERSHELL_LISTING, 'utf-16'), (u'\ufeff' + POWERSHELL_LISTING, 'utf-16-be'), (POWERSHELL_LISTING, 'utf-8-sig')):
+            for listing in ('powershell', 'auto'):
+                self.assertUrls(self.parse(text, listing, WINDOWS_PREFIX, encoding),
+                                ['/admin/', '/index.html', '/my file.txt', '/admin/web.config'])
+
+    def testLinuxLongList(self):
+        self.assertUrls(self.parse(LS_LR_LISTING, 'ls-lR'),
+                        ['/admin/', '/index.html', '/my file.txt', '/admin/config.php', '/admin/old/', '/admin/old/backup.zip'])
+
+    def testLinuxList(self):
+        self.assertUrls(self.parse(LS_R_LISTING, 'ls-R'),
+                        ['/admin/', '/index.html', '/my file.txt', '/admin/config.php', '/admin/old', '/admin/old/backup.zip'])
+
+    def testFind(self):
+        self.assertUrls(self.parse(FIND_LISTING, 'find'),
+                        ['/admin/', '/admin/config.php', '/admin/old/', '/admin/old/backup.zip', '/index.html', '/my file.txt'])
+
+    # An absolute prefix is the web root: paths outside it are skipped and relative paths start at it
+    def testFindAbsolutePrefix(self):
+        self.assertUrls(self.parse(ABSOLUTE_FIND_LISTING, 'find', '/var/www'), ['/admin/', '/admin/config.php', '/index.html'])
+        self.assertUrls(self.parse(FIND_LISTING, 'find', '/var/www/'),
+                        ['/admin/', '/admin/config.php', '/admin/old/', '/admin/old/backup.zip', '/index.html', '/my file.txt'])
+
+    def testFindRelativePrefix(self):
+        self.assertUrls(self.parse(u'./admin\n./admin/config.php\n', 'find', 'app'), ['/app/admin/', '/app/admin/config.php'])
+
+    def testTree(self):
+        self.assertUrls(self.parse(TREE_LISTING, 'tree'),
+                        ['/admin/', '/admin/config.php', '/admin/old/', '/admin/old/backup.zip', '/index.html', '/my file.txt'])
+
+    def testAutoDetect(self):
+        for text, prefix, listing in ((DIR_LISTING, WINDOWS_PREFIX, 'windows'), (POWERSHELL_LISTING, WINDOWS_PREFIX, 'powershell'),
+                                      (LS_LR_LISTING, DEFAULT_DIR_PREFIX, 'ls-lR'), (LS_R_LISTING, DEFAULT_DIR_PREFIX, 'ls-R'),
+                                      (FIND_LISTING, DEFAULT_DIR_PREFIX, 'find'), (TREE_LISTING, DEFAULT_DIR_PREFIX, 'tree')):
+            self.assertEqual(self.parse(text, 'auto', prefix), self.parse(text, listing, prefix))
+
+    def testWrongTypeIsReported(self):
+        self.assertRaises(ListingParserError, self.parse, TREE_LISTING, 'ls-lR')
+
+    # Directory headers of 'ls -R' only mark stored URLs as directories, so they are neither filtered nor counted
+    def testDirectoryHeadersNotFiltered(self):
+        metrics = Metrics(True)
+        parser = ListingParser(UrlFilter(parseRules('keyword:logout')), metrics)
+        filename = self.writeListing(u'.:\nindex.html  logout\n\n./logout:\na.php  sub\n\n./logout/sub:\nb.php\n')
+        self.assertEqual(list(parser.iterUrls('www.example.com', DEFAULT_DIR_PREFIX, 'http://', '80', 'ls-R', filename)), [URL_BASE + '/index.html'])
+        self.assertEqual(parser.urlFilter.hitCounts(), [('keyword:logout', 4)])
+        self.assertEqual((metrics.counters['urls.parsed'], metrics.counters['urls.filtered']), (5, 4))
+
+    # A chunk size far below the listing size splits each listing at many directory headers
+    @unittest.skipIf(multiprocessing is None, 'needs multiprocessing')
+    def testParallelMatchesSerial(self):
+        for text, listing, prefix in ((DIR_LISTING * 20, 'windows', WINDOWS_PREFIX), (LS_LR_LISTING * 20, 'ls-lR', DEFAULT_DIR_PREFIX),
+                                      (LS_R_LISTING * 20, 'ls-R', DEFAULT_DIR_PREFIX)):
+            filename = self.writeListing(text)
+            serial = ListingParser()
+            serialUrls = list(serial.iterUrls('www.example.com', prefix, 'http://', '80', listing, filename))
+            parallel = ListingParser()
+            parallelUrls = list(parallel.iterUrlsParallel('www.example.com', prefix, 'http://', '80', listing, filename, 2, 32))
+            self.assertEqual(parallelUrls, serialUrls)
+            self.assertEqual(list(parallel.returnList()), list(serial.returnList()))
+            self.assertEqual((parallel.store.directoryCount, parallel.store.fileCount), (serial.store.directoryCount, serial.store.fileCount))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+Tests for the parse and import metrics.
+
+    python -m pytest tests
+"""
+
+import os, sys, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import metrics
+from metrics import Metrics
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class MetricsTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.realTime = metrics.time.time
+        metrics.time.time = self.clock
+
+    def tearDown(self):
+        metrics.time.time = self.realTime
+
+    # Each call of the wrapped function takes one second of the fake clock
+    def slowDouble(self, value):
+        self.clock.now += 1.0
+        return value * 2
+
+    def testDisabledHandsBackFunctions(self):
+        disabled = Metrics(False)
+        function = self.slowDouble
+        self.assertTrue(disabled.timedCall(function, 'tokenize') is function)
+        self.assertTrue(disabled.sampledCall(function, 'tokenize') is function)
+        disabled.count('lines')
+        self.assertEqual(disabled.report(), [])
+
+    def testTimedCall(self):
+        enabled = Metrics()
+        timed = enabled.timedCall(self.slowDouble, 'store')
+        self.assertEqual([timed(i) for i in range(3)], [0, 2, 4])
+        self.assertEqual(enabled.phaseTimes(), {'store': 3.0})
+
+    # Only every fourth call is timed, and it stands for all four
+    def testSampledCall(self):
+        enabled = Metrics()
+        sampled = enabled.sampledCall(self.slowDouble, 'tokenize', 4)
+        self.assertEqual([sampled(i) for i in range(10)], [i * 2 for i in range(10)])
+        self.assertEqual(enabled.phaseTimes(), {'tokenize': 8.0})
+
+    def testBuildIsParseWithoutReadAndTokenize(self):
+        enabled = Metrics()
+        enabled.addTime('parse', 5.0)
+        enabled.addTime('read', 1.0)
+        enabled.timedCall(self.slowDouble, 'tokenize')(1)
+        self.assertEqual(enabled.phaseTimes(), {'read': 1.0, 'tokenize': 1.0, 'build': 3.0})
+
+    def testMerge(self):
+        enabled = Metrics()
+        enabled.count('lines', 2)
+        enabled.merge({'phases': {'read': 1.5}, 'counters': {'lines': 3, 'urls.parsed': 1}})
+        self.assertEqual(enabled.counters, {'lines': 5, 'urls.parsed': 1})
+        self.assertEqual(enabled.phaseTimes(), {'read': 1.5})
+
+    def testLatencyHistogram(self):
+        enabled = Metrics()
+        enabled.observe('probe', 'h', 0.005)
+        enabled.observe('probe', 'h', 20.0)
+        latency = enabled.toDict()['latency']['h']
+        self.assertEqual((latency['count'], latency['counts'][0], latency['counts'][-1]), (2, 1, 1))
+        self.assertEqual(enabled.report()[-1], '    <=10ms: 1, >10000ms: 1')
+
+
+if __name__ == '__main__':
+    unittest.main()
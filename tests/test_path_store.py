@@ -0,0 +1,90 @@
+"""
+Tests of the deduplicating URL store.
+
+    python -m pytest tests
+"""
+
+import os, sys, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from path_store import DIRECTORY, DIRECTORY_HEADER, FILE, INITIAL_TABLE_SIZE, UNKNOWN, PathStore
+
+BASE = 'https://www.example.com:443'
+
+# A name outside ASCII, as the listing reader gives it: text under Python 3 and UTF-8 bytes under Python 2
+NAME = u'caf\xe9 menu.html'
+if sys.version_info[0] < 3:
+    NAME = NAME.encode('utf-8')
+
+
+class PathStoreTest(unittest.TestCase):
+    def testDeduplicatesAndKeepsOrder(self):
+        store = PathStore()
+        urls = [BASE + '/a/', BASE + '/a/b.html', BASE + '/c.txt', BASE + '/a/b.html', BASE + '/a/', BASE + '/c.txt']
+        self.assertEqual([store.add(url) for url in urls], [True, True, True, False, False, False])
+        self.assertEqual(list(store), urls[:3])
+        self.assertEqual(len(store), 3)
+        self.assertEqual(store[-1], BASE + '/c.txt')
+        self.assertRaises(IndexError, store.__getitem__, 3)
+        self.assertTrue(BASE + '/a/b.html' in store)
+        self.assertFalse(BASE + '/a/b.htm' in store)
+        self.assertEqual(store.index(BASE + '/c.txt'), 2)
+
+    # The first occurrence keeps its metadata.  Names are kept apart per directory, and a URL without a path is stored whole
+    def testMetadataAndNames(self):
+        store = PathStore()
+        store.add(BASE + '/x/data.zip', FILE, 1024, 'Jan 10 09:01')
+        store.add(BASE + '/x/data.zip', FILE, 1, 'Jan 11 10:00')
+        store.add(BASE + '/y/data.zip', FILE, 7, None)
+        store.add(BASE + '/y/' + NAME)
+        store.add(BASE)
+        self.assertEqual(list(store), [BASE + '/x/data.zip', BASE + '/y/data.zip', BASE + '/y/' + NAME, BASE])
+        self.assertEqual(store.metadata(0), (FILE, 1024, 'Jan 10 09:01'))
+        self.assertEqual(store.metadata(1), (FILE, 7, None))
+        self.assertEqual(store.metadata(3), (UNKNOWN, -1, None))
+        self.assertFalse(store.add(BASE))
+
+    # Directories are counted from the directory flag, or from a trailing '/' when the listing gives no type
+    def testCounts(self):
+        store = PathStore()
+        store.add(BASE + '/a/', UNKNOWN)
+        store.add(BASE + '/b', DIRECTORY)
+        store.add(BASE + '/c', UNKNOWN)
+        store.add(BASE + '/d.txt', FILE)
+        self.assertEqual((store.directoryCount, store.fileCount), (2, 2))
+        # A header or a later DIRECTORY entry marks a stored URL as a directory without adding it again
+        self.assertFalse(store.add(BASE + '/c', DIRECTORY_HEADER))
+        self.assertFalse(store.add(BASE + '/d.txt', DIRECTORY))
+        self.assertFalse(store.add(BASE + '/missing', DIRECTORY_HEADER))
+        self.assertEqual((store.directoryCount, store.fileCount), (4, 0))
+        self.assertEqual(len(store), 4)
+
+    # Growing the hash table keeps every entry findable and still rejects duplicates
+    def testTableGrowth(self):
+        store = PathStore()
+        urls = [BASE + '/dir%d/file%d.html' % (i % 13, i) for i in range(INITIAL_TABLE_SIZE * 3)]
+        for url in urls:
+            self.assertTrue(store.add(url, FILE))
+        self.assertTrue(len(store.table) >= 2 * len(urls))
+        self.assertFalse([url for url in urls if store.add(url)])
+        self.assertEqual([store.index(url) for url in urls], list(range(len(urls))))
+        self.assertEqual(list(store), urls)
+        self.assertEqual(store.fileCount, len(urls))
+
+    # Only new names are yielded, after they are stored, and headers only mark stored entries as directories
+    def testAddDirectory(self):
+        store = PathStore()
+        store.add(BASE + '/a/x.html', FILE)
+        store.add(BASE + '/a/sub', UNKNOWN)
+        added = []
+        for url in store.addDirectory(BASE + '/a', ['x.html', 'y.html', 'sub', 'z', 'y.html'], [FILE, FILE, DIRECTORY_HEADER, DIRECTORY, FILE],
+                                      [1, 2, -1, -1, 3], [None] * 5):
+            added.append((url, store[len(store) - 1]))
+        self.assertEqual(added, [(BASE + '/a/y.html', BASE + '/a/y.html'), (BASE + '/a/z', BASE + '/a/z')])
+        self.assertEqual(store.metadata(store.index(BASE + '/a/y.html')), (FILE, 2, None))
+        self.assertEqual(store.metadata(store.index(BASE + '/a/sub'))[0], DIRECTORY)
+        self.assertEqual((store.directoryCount, store.fileCount), (2, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+"""
+Tests for the on-disk probe cache: TTL, revalidation with 304, LRU eviction and the cache file.
+
+    python -m pytest tests
+"""
+
+import os, shutil, sys, tempfile, time, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from probe_cache import ProbeCache, responseValidators
+
+ETAG = 'ETag: "abc"'
+LAST_MODIFIED = 'Last-Modified: Tue, 15 Jan 2013 10:22:00 GMT'
+
+
+class ProbeCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix='cache-test-')
+        self.path = os.path.join(self.workdir, 'cache', 'probe.cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    # Move a cached entry back in time so it looks older than the TTL
+    def age(self, cache, url, seconds):
+        cache.entries[url][4] -= seconds
+
+    def testResponseValidators(self):
+        self.assertEqual(responseValidators(['HTTP/1.1 200 OK', 'Content-Length: 12', ETAG, LAST_MODIFIED]),
+                         (12, '"abc"', 'Tue, 15 Jan 2013 10:22:00 GMT'))
+        self.assertEqual(responseValidators(['HTTP/1.1 206 Partial Content', 'Content-Length: 10', 'Content-Range: bytes 0-9/2048']),
+                         (2048, '', ''))
+        self.assertEqual(responseValidators([]), (-1, '', ''))
+
+    def testFreshAndStale(self):
+        cache = ProbeCache(self.path, ttl=60)
+        self.assertEqual(cache.lookup('http://h/a'), None)
+        self.assertEqual(cache.store('http://h/a', 200, [ETAG]), 200)
+        self.assertEqual(cache.lookup('http://h/a'), (200, True))
+        self.age(cache, 'http://h/a', 120)
+        self.assertEqual(cache.lookup('http://h/a'), (200, False))
+
+    # Without ETag or Last-Modified a stale entry cannot be revalidated, so it is dropped
+    def testStaleWithoutValidatorDropped(self):
+        cache = ProbeCache(self.path, ttl=60)
+        cache.store('http://h/a', 200, ['Content-Length: 5'])
+        self.age(cache, 'http://h/a', 120)
+        self.assertEqual(cache.lookup('http://h/a'), None)
+        self.assertNotIn('http://h/a', cache.entries)
+
+    def testConditionalHeaders(self):
+        cache = ProbeCache(self.path)
+        self.assertEqual(cache.conditionalHeaders('http://h/a'), [])
+        cache.store('http://h/a', 200, [ETAG, LAST_MODIFIED])
+        self.assertEqual(cache.conditionalHeaders('http://h/a'),
+                         ['If-None-Match: "abc"', 'If-Modified-Since: Tue, 15 Jan 2013 10:22:00 GMT'])
+
+    # A 304 stands for the cached response, so its status is kept and the entry is fresh again
+    def testNotModifiedRenews(self):
+        cache = ProbeCache(self.path, ttl=60)
+        cache.store('http://h/a', 403, [ETAG])
+        self.age(cache, 'http://h/a', 120)
+        self.assertEqual(cache.store('http://h/a', 304, []), 403)
+        self.assertEqual(cache.lookup('http://h/a'), (403, True))
+        self.assertEqual(cache.conditionalHeaders('http://h/a'), ['If-None-Match: "abc"'])
+        self.assertEqual(cache.revalidated, 1)
+
+    def testNotModifiedWithoutEntryStored(self):
+        cache = ProbeCache(self.path)
+        self.assertEqual(cache.store('http://h/a', 304, []), 304)
+        self.assertEqual(cache.revalidated, 0)
+
+    def testLeastRecentlyUsedEvicted(self):
+        cache = ProbeCache(self.path, maxEntries=2)
+        cache.store('http://h/a', 200, [])
+        cache.store('http://h/b', 200, [])
+        cache.lookup('http://h/a')
+        cache.store('http://h/c', 200, [])
+        self.assertEqual(list(cache.entries), ['http://h/a', 'http://h/c'])
+
+    def testSaveAndLoad(self):
+        cache = ProbeCache(self.path)
+        cache.store('http://h/a', 200, ['Content-Length: 12', ETAG])
+        cache.store('http://h/b c', 404, [LAST_MODIFIED])
+        cache.save()
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+        loaded = ProbeCache(self.path)
+        loaded.load()
+        self.assertEqual(list(loaded.entries), ['http://h/a', 'http://h/b c'])
+        self.assertEqual(loaded.entries['http://h/a'][:4], [200, 12, '"abc"', ''])
+        self.assertEqual(loaded.lookup('http://h/b c'), (404, True))
+
+    # A torn last line or a line from another format is skipped, and loading still honours maxEntries
+    def testLoadSkipsMalformedLines(self):
+        os.makedirs(os.path.dirname(self.path))
+        stored = '%.0f' % time.time()
+        f = open(self.path, 'w')
+        try:
+            f.write('http://h/a\t200\t-1\t\t\t' + stored + '\n')
+            f.write('not a cache line\n')
+            f.write('http://h/b\tabc\t-1\t\t\t' + stored + '\n')
+            f.write('http://h/c\t200\tx\t\t\t' + stored + '\n')
+            f.write('http://h/d\t200\t-1\t\t\t' + stored + '\n')
+            f.write('http://h/e\t2')
+        finally:
+            f.close()
+        cache = ProbeCache(self.path)
+        cache.load()
+        self.assertEqual(list(cache.entries), ['http://h/a', 'http://h/d'])
+        cache = ProbeCache(self.path, maxEntries=1)
+        cache.load()
+        self.assertEqual(list(cache.entries), ['http://h/d'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+"""
+Tests of the import probing engine against a local stand-in HTTP server.
+
+    python -m pytest tests
+"""
+
+import os, sys, threading, time, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from probe_engine import ProbeEngine
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urllib2 import HTTPError, urlopen
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.error import HTTPError
+    from urllib.request import urlopen
+
+
+# Answers 404 for paths containing 'missing' and 200 otherwise.  A path ending in '/slow/<ms>' is answered after that delay
+class StandInHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if '/slow/' in self.path:
+            time.sleep(int(self.path.rsplit('/', 1)[1]) / 1000.0)
+        self.send_response(404 if 'missing' in self.path else 200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StandInServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def fetch(url, timeout):
+    return urlopen(url, timeout=timeout).getcode()
+
+
+class ProbeEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.server = StandInServer(('127.0.0.1', 0), StandInHandler)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.base = 'http://127.0.0.1:%d/' % self.server.server_address[1]
+        self.consumed = []
+        self.errors = []
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def consume(self, url, result):
+        self.consumed.append((url, result))
+
+    def error(self, url, exception):
+        self.errors.append((url, exception))
+
+    # Later URLs answer first, but results are still handed back in URL order
+    def testResultsInUrlOrder(self):
+        urls = [self.base + 'slow/%d' % delay for delay in (200, 150, 100, 50, 0)]
+        engine = ProbeEngine(fetch, self.consume, self.error, concurrency=5)
+        self.assertEqual(engine.run(urls), 5)
+        self.assertEqual(self.consumed, [(url, 200) for url in urls])
+        self.assertEqual(self.errors, [])
+
+    def testErrorsReported(self):
+        urls = [self.base + 'a', self.base + 'missing/b', self.base + 'c']
+        engine = ProbeEngine(fetch, self.consume, self.error, concurrency=2)
+        engine.run(urls)
+        self.assertEqual(self.consumed, [(urls[0], 200), (urls[2], 200)])
+        self.assertEqual([url for url, exception in self.errors], [urls[1]])
+        self.assertTrue(isinstance(self.errors[0][1], HTTPError))
+        self.assertEqual(engine.failed, 1)
+
+    # 10 URLs at 20 requests per second take at least 9 intervals of 50 ms, whatever the number of workers
+    def testRateCapPerUrl(self):
+        engine = ProbeEngine(fetch, self.consume, concurrency=8, maxPerSecond=20)
+        start = time.time()
+        engine.run([self.base + 'u%d' % i for i in range(10)])
+        self.assertTrue(time.time() - start >= 0.44)
+        self.assertEqual(len(self.consumed), 10)
+
+    # With throttledProbe the cap applies to each request the probe sends, here three per URL
+    def testRateCapPerRequest(self):
+        sent = []
+        def probe(url, timeout):
+            for i in range(3):
+                engine.throttle(url)
+                sent.append(fetch(url, timeout))
+            return 200
+        engine = ProbeEngine(probe, self.consume, concurrency=8, maxPerSecond=20, throttledProbe=True)
+        start = time.time()
+        engine.run([self.base + 'u%d' % i for i in range(4)])
+        self.assertTrue(time.time() - start >= 0.54)
+        self.assertEqual(len(sent), 12)
+
+    # The cap is per host, so a second host is not slowed down by the first
+    def testRateCapPerHost(self):
+        other = self.base.replace('127.0.0.1', 'localhost')
+        engine = ProbeEngine(fetch, self.consume, concurrency=8, maxPerSecond=10)
+        start = time.time()
+        engine.run([self.base + 'a', other + 'a', self.base + 'b', other + 'b'])
+        self.assertTrue(time.time() - start < 0.19)
+        self.assertEqual(len(self.consumed), 4)
+
+    def testCancelMidRun(self):
+        urls = [self.base + 'slow/20/%d' % i for i in range(50)]
+        engine = ProbeEngine(lambda url, timeout: fetch(url.rsplit('/', 1)[0], timeout), self.consume, self.error, concurrency=2,
+                             progress=lambda done, total: done == 3 and engine.cancel())
+        self.assertEqual(engine.run(urls), 3)
+        self.assertEqual([url for url, result in self.consumed], urls[:3])
+        self.assertTrue(engine.isCancelled())
+        # A cancelled engine does not start again
+        self.assertEqual(engine.run(urls), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
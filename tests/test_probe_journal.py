@@ -0,0 +1,101 @@
+"""
+Tests for the probe journal used to resume an interrupted site map import.
+
+    python -m pytest tests
+"""
+
+import os, shutil, sys, tempfile, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from probe_journal import ProbeJournal
+
+
+class ProbeJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix='journal-test-')
+        self.path = os.path.join(self.workdir, 'journals', 'import.journal')
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def writeJournal(self, data):
+        journal = ProbeJournal(self.path)
+        journal.open(False)
+        journal.close()
+        f = open(self.path, 'wb')
+        try:
+            f.write(data)
+        finally:
+            f.close()
+
+    def readJournal(self):
+        f = open(self.path, 'rb')
+        try:
+            return f.read()
+        finally:
+            f.close()
+
+    def testMissingJournalLoadsEmpty(self):
+        self.assertEqual(ProbeJournal(self.path).load(), {})
+
+    def testRecordAndLoad(self):
+        journal = ProbeJournal(self.path)
+        journal.open(False)
+        journal.record('http://h/a', 200)
+        journal.record('http://h/b c', 404)
+        journal.close()
+        self.assertEqual(ProbeJournal(self.path).load(), {'http://h/a': 200, 'http://h/b c': 404})
+
+    # A crash can leave half a record at the end, which must neither load nor get glued to the next record
+    def testTornLastLine(self):
+        self.writeJournal(b'200\thttp://h/a\n404\thttp://h/b\n30')
+        journal = ProbeJournal(self.path)
+        self.assertEqual(journal.load(), {'http://h/a': 200, 'http://h/b': 404})
+        journal.open(True)
+        journal.record('http://h/c', 302)
+        journal.close()
+        self.assertEqual(self.readJournal(), b'200\thttp://h/a\n404\thttp://h/b\n302\thttp://h/c\n')
+        self.assertEqual(ProbeJournal(self.path).load(), {'http://h/a': 200, 'http://h/b': 404, 'http://h/c': 302})
+
+    def testTornOnlyLine(self):
+        self.writeJournal(b'200\thttp://h/a')
+        journal = ProbeJournal(self.path)
+        self.assertEqual(journal.load(), {})
+        journal.open(True)
+        journal.close()
+        self.assertEqual(self.readJournal(), b'')
+
+    def testMalformedLinesSkipped(self):
+        self.writeJournal(b'garbage\nabc\thttp://h/x\n200\thttp://h/a\n')
+        self.assertEqual(ProbeJournal(self.path).load(), {'http://h/a': 200})
+
+    def testOpenWithoutResumeStartsOver(self):
+        self.writeJournal(b'200\thttp://h/a\n')
+        journal = ProbeJournal(self.path)
+        journal.open(False)
+        journal.record('http://h/b', 200)
+        journal.close()
+        self.assertEqual(ProbeJournal(self.path).load(), {'http://h/b': 200})
+
+    # Records are only pushed to disk every syncEvery records, and close flushes the rest
+    def testSyncEvery(self):
+        journal = ProbeJournal(self.path, syncEvery=2, syncInterval=3600)
+        journal.open(False)
+        journal.record('http://h/a', 200)
+        self.assertEqual(journal.pending, 1)
+        journal.record('http://h/b', 200)
+        self.assertEqual(journal.pending, 0)
+        self.assertEqual(ProbeJournal(self.path).load(), {'http://h/a': 200, 'http://h/b': 200})
+        journal.close()
+
+    def testRemove(self):
+        journal = ProbeJournal(self.path)
+        journal.open(False)
+        journal.record('http://h/a', 200)
+        journal.remove()
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(journal.load(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+Tests for the breadth-first probing order, directory pruning and sampling of the site map import.
+
+    python -m pytest tests
+"""
+
+import os, sys, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from probe_scheduler import TreeScheduler, parseStatuses
+
+URLS = [
+    'http://h/index.html',
+    'http://h/admin/',
+    'http://h/admin/config.php',
+    'http://h/admin/old/',
+    'http://h/admin/old/backup.zip',
+    'http://h/images/',
+    'http://h/images/logo.png',
+    'http://h/about.html',
+]
+
+
+# Probe every wave the way importList does, answering from statuses and 200 for anything else
+def probeAll(scheduler, statuses):
+    waves = []
+    for wave in scheduler.waves():
+        waves.append(wave)
+        for url in wave:
+            scheduler.record(url, statuses.get(url, 200))
+    return waves
+
+
+class TreeSchedulerTest(unittest.TestCase):
+    def testWavesByDepth(self):
+        waves = probeAll(TreeScheduler(URLS), {})
+        self.assertEqual(waves, [
+            ['http://h/index.html', 'http://h/admin/', 'http://h/images/', 'http://h/about.html'],
+            ['http://h/admin/config.php', 'http://h/admin/old/', 'http://h/images/logo.png'],
+            ['http://h/admin/old/backup.zip'],
+        ])
+
+    def testUrlWithoutPath(self):
+        waves = probeAll(TreeScheduler(['http://h', 'http://h/a/', 'http://h/a/b']), {'http://h/a/': 404})
+        self.assertEqual(waves, [['http://h', 'http://h/a/']])
+
+    def testPruneBelowMissingDirectory(self):
+        scheduler = TreeScheduler(URLS)
+        waves = probeAll(scheduler, {'http://h/admin/': 404})
+        self.assertEqual(waves, [
+            ['http://h/index.html', 'http://h/admin/', 'http://h/images/', 'http://h/about.html'],
+            ['http://h/images/logo.png'],
+        ])
+        self.assertEqual((scheduler.prunedDirectories, scheduler.prunedUrls, scheduler.sampledUrls), (1, 3, 0))
+
+    # Only the configured statuses prune, so a 403 directory is probed through by default
+    def testPruneStatuses(self):
+        statuses = {'http://h/admin/': 403}
+        self.assertEqual(sum(len(wave) for wave in probeAll(TreeScheduler(URLS), statuses)), len(URLS))
+        scheduler = TreeScheduler(URLS, (404, 403))
+        self.assertEqual(sum(len(wave) for wave in probeAll(scheduler, statuses)), len(URLS) - 3)
+
+    def testMissingFileDoesNotPrune(self):
+        scheduler = TreeScheduler(['http://h/a', 'http://h/a/b'])
+        self.assertEqual(probeAll(scheduler, {'http://h/a': 404}), [['http://h/a'], ['http://h/a/b']])
+        self.assertEqual(scheduler.prunedDirectories, 0)
+
+    # A sample found below a 404 directory shows it only hides its listing, so the levels below are probed again
+    def testSampleLiftsPruning(self):
+        scheduler = TreeScheduler(URLS, sampleSize=1)
+        waves = probeAll(scheduler, {'http://h/admin/': 404})
+        self.assertEqual(waves[1], ['http://h/admin/config.php', 'http://h/images/logo.png'])
+        self.assertEqual(waves[2], ['http://h/admin/old/backup.zip'])
+        self.assertEqual((scheduler.sampledUrls, scheduler.unprunedDirectories, scheduler.prunedUrls), (1, 1, 1))
+
+    def testMissingSampleKeepsPruning(self):
+        scheduler = TreeScheduler(URLS, sampleSize=1)
+        waves = probeAll(scheduler, {'http://h/admin/': 404, 'http://h/admin/config.php': 404})
+        self.assertEqual(waves[1:], [['http://h/admin/config.php', 'http://h/images/logo.png']])
+        self.assertEqual((scheduler.sampledUrls, scheduler.unprunedDirectories, scheduler.prunedUrls), (1, 0, 2))
+
+    def testParseStatuses(self):
+        self.assertEqual(parseStatuses('404, 403,,401 '), (404, 403, 401))
+        self.assertEqual(parseStatuses(''), ())
+        self.assertRaises(ValueError, parseStatuses, '404,abc')
+
+
+if __name__ == '__main__':
+    unittest.main()
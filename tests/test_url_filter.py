@@ -0,0 +1,106 @@
+"""
+Tests of the include/exclude filter applied to generated paths.
+
+    python -m pytest tests
+"""
+
+import os, random, re, sys, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from url_filter import RuleMatcher, UrlFilter, globLiteral, globRegex, parseRules, regexLiteral
+
+
+class UrlFilterTest(unittest.TestCase):
+    def testParseRules(self):
+        rules = parseRules('# comment\n\nlogout\n+ext:php, .HTML\nglob:*.bak\nregex:^/adm(in)?/\nunknown:x')
+        self.assertEqual([str(rule) for rule in rules], ['keyword:logout', '+ext:php, .HTML', 'glob:*.bak', 'regex:^/adm(in)?/', 'keyword:unknown:x'])
+        self.assertRaises(ValueError, parseRules, 'regex:(')
+        self.assertRaises(ValueError, parseRules, 'glob: ')
+
+    def testDefaultRules(self):
+        urlFilter = UrlFilter()
+        self.assertFalse(urlFilter.allows('/account/logout.php'))
+        self.assertFalse(urlFilter.allows('/signout/'))
+        self.assertTrue(urlFilter.allows('/index.html'))
+        self.assertEqual(dict(urlFilter.hitCounts())['keyword:logout'], 1)
+
+    # Globs cover the whole path, '*' crossing '/'
+    def testGlobAnchored(self):
+        urlFilter = UrlFilter(parseRules('glob:*.bak\nglob:/static/?.js'))
+        self.assertFalse(urlFilter.allows('/a/b/site.bak'))
+        self.assertTrue(urlFilter.allows('/site.bak/index.html'))
+        self.assertFalse(urlFilter.allows('/static/a.js'))
+        self.assertTrue(urlFilter.allows('/static/ab.js'))
+        self.assertTrue(urlFilter.allows('/x/static/a.js'))
+
+    def testExtensions(self):
+        urlFilter = UrlFilter(parseRules('ext:JPG, .png'))
+        self.assertFalse(urlFilter.allows('/img/photo.jpg'))
+        self.assertFalse(urlFilter.allows('/img/logo.PNG'))
+        self.assertTrue(urlFilter.allows('/img.png/readme'))
+
+    # Exclude rules win over include rules, and paths matching no include rule are counted apart
+    def testIncludeRules(self):
+        urlFilter = UrlFilter(parseRules('+ext:php\n+glob:/api/*\nkeyword:debug'))
+        self.assertEqual([urlFilter.allows(path) for path in ('/index.php', '/api/users', '/debug.php', '/style.css')], [True, True, False, False])
+        self.assertEqual(urlFilter.notIncluded, 1)
+        self.assertEqual(urlFilter.hitCounts(), [('+ext:php', 1), ('+glob:/api/*', 1), ('keyword:debug', 1)])
+        urlFilter.resetCounts()
+        self.assertEqual(urlFilter.notIncluded, 0)
+
+    def testLiterals(self):
+        self.assertEqual(globLiteral('*/backup/*.zip'), '/backup/')
+        self.assertEqual(globLiteral('*'), '')
+        self.assertEqual(regexLiteral(r'^/admin\d+/config\.php$'), '/config.php')
+        self.assertEqual(regexLiteral('a|b'), '')
+        self.assertEqual(regexLiteral('(?i)/ADMIN/'), '')
+
+    # Each path is only tried against the rules whose literal it contains, but the first matching rule in order still wins
+    def testFirstMatchingRuleWins(self):
+        rules = parseRules('glob:*/admin/*\nregex:/adm\nglob:*.php\nregex:(?i)SECRET\nglob:*')
+        matcher = RuleMatcher(rules)
+        self.assertTrue(matcher.match('/x/admin/a.php') is rules[0])
+        self.assertTrue(matcher.match('/x/adm.php') is rules[1])
+        self.assertTrue(matcher.match('/x/index.php') is rules[2])
+        self.assertTrue(matcher.match('/x/Secret.txt') is rules[3])
+        self.assertTrue(matcher.match('/x/index.html') is rules[4])
+
+    # Regexes reusing a group name, back references or flags are each compiled on their own
+    def testRegexesCompiledApart(self):
+        urlFilter = UrlFilter(parseRules('regex:/(?P<name>old)/\nregex:/(?P<name>tmp)/\nregex:/(\\w+)/\\1/\nregex:(?i)/BACKUP'))
+        self.assertFalse(urlFilter.allows('/old/a'))
+        self.assertFalse(urlFilter.allows('/tmp/a'))
+        self.assertFalse(urlFilter.allows('/x/x/a'))
+        self.assertFalse(urlFilter.allows('/Backup/a'))
+        self.assertTrue(urlFilter.allows('/x/y/a'))
+        self.assertEqual([hits for rule, hits in urlFilter.hitCounts()], [1, 1, 1, 1])
+
+    # The indexed matcher agrees with trying every rule in turn, including literals that are prefixes of each other
+    def testMatchesRuleByRule(self):
+        generator = random.Random(0)
+        words = ('adm', 'admin', 'administrator', 'old', 'backup', 'img', 'x')
+        lines = []
+        for i in range(200):
+            word = generator.choice(words)
+            lines.append(generator.choice(('glob:*/%s%d/*', 'glob:*%s%d.php', 'regex:/%s%d', 'regex:^/%s.*%d$')) % (word, i % 20))
+        rules = parseRules('\n'.join(lines))
+        matcher = RuleMatcher(rules)
+        tests = []
+        for rule in rules:
+            if rule.kind == 'glob':
+                tests.append((rule, re.compile(globRegex(rule.pattern)).match))
+            else:
+                tests.append((rule, re.compile(rule.pattern).search))
+        for i in range(2000):
+            path = '/' + '/'.join(generator.choice(words) + str(generator.randint(0, 25)) for depth in range(generator.randint(1, 4)))
+            path += generator.choice(('', '.php', '/'))
+            expected = None
+            for rule, test in tests:
+                if test(path):
+                    expected = rule
+                    break
+            self.assertTrue(matcher.match(path) is expected, path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,268 @@
+"""
+Include/exclude filter applied to the paths generated by the Directory and File Listing Parser.
+
+Rules are written one per line as 'type:pattern', where type is keyword, glob, regex or ext (a comma separated
+list of file extensions).  A line without a type is a keyword, a leading '+' makes the rule an include rule and
+'#' starts a comment.  The cost of checking a path stays flat as the number of rules grows:  keywords become one
+regular expression built from a trie of the keywords and extensions are looked up in a set.  Globs and regexes are
+indexed by a literal part every matching path must contain, e.g. '.bak' for '*.bak', all of which are found in one
+pass, so only the rules whose literal occurs in the path are tried.
+"""
+
+import re
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+# Endpoints excluded by default because requesting them could end the session or change the target's state
+DEFAULT_RULES = '''keyword:logout
+keyword:logoff
+keyword:exit
+keyword:signout'''
+
+RULE_TYPES = ('keyword', 'glob', 'regex', 'ext')
+
+
+class FilterRule:
+    def __init__(self, kind, pattern, include=False):
+        if kind not in RULE_TYPES:
+            raise ValueError('Unknown filter rule type: ' + kind)
+        self.kind = kind
+        self.pattern = pattern
+        self.include = include
+        self.hits = 0
+
+    def __str__(self):
+        if self.include:
+            return '+' + self.kind + ':' + self.pattern
+        return self.kind + ':' + self.pattern
+
+
+# Parse rules written one per line, raising ValueError for an unknown rule type or invalid regex
+def parseRules(text):
+    rules = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        include = line.startswith('+')
+        if include:
+            line = line[1:]
+        kind, separator, pattern = line.partition(':')
+        if not separator or kind not in RULE_TYPES:
+            kind, pattern = 'keyword', line
+        if not pattern.strip():
+            raise ValueError('Empty pattern in filter rule: ' + line)
+        rule = FilterRule(kind, pattern, include)
+        if kind == 'regex':
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                raise ValueError('Invalid regex in filter rule ' + str(rule) + ': ' + str(e))
+        rules.append(rule)
+    return rules
+
+
+# Regular expression matching any of the keywords, built from a trie so shared prefixes are only tested once
+def keywordRegex(keywords):
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = True
+    return re.compile(trieRegex(trie))
+
+
+def trieRegex(node):
+    branches = []
+    for char in sorted(node):
+        if char:
+            branches.append(re.escape(char) + trieRegex(node[char]))
+    # Reaching the end of a keyword is enough, longer keywords sharing the prefix would not change the outcome
+    if '' in node or not branches:
+        return ''
+    if len(branches) == 1:
+        return branches[0]
+    return '(?:' + '|'.join(branches) + ')'
+
+
+# Glob where '*' matches any run of characters, including '/', and '?' matches one character.  The expression is
+# anchored at both ends and is tried with match, so it is only attempted at the start of the path
+def globRegex(pattern):
+    parts = []
+    for char in pattern:
+        if char == '*':
+            parts.append('.*')
+        elif char == '?':
+            parts.append('.')
+        else:
+            parts.append(re.escape(char))
+    return '^' + ''.join(parts) + '$'
+
+
+# Longest run of literal characters every path matching the glob contains, or '' if the glob has none
+def globLiteral(pattern):
+    return max(re.split(r'[*?]', pattern), key=len)
+
+
+# Longest run of literal characters every string the regex matches contains, or '' if none can be worked out.
+# Only the top level of the parsed expression is read, so literals inside groups, repeats or alternations are ignored
+def regexLiteral(pattern):
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception:
+        return ''
+    state = getattr(parsed, 'state', None) or parsed.pattern
+    if state.flags & re.IGNORECASE:
+        return ''
+    longest = run = ''
+    for op, value in parsed:
+        if op == sre_parse.LITERAL:
+            run += chr(value)
+            if len(run) > len(longest):
+                longest = run
+        else:
+            run = ''
+    return longest
+
+
+# Regular expression finding, at every position of a path, the longest of the literals starting there.  Built from a
+# trie like keywordRegex, but keeps going past the end of a literal so longer literals sharing the prefix are found
+def literalRegex(literals):
+    trie = {}
+    for literal in literals:
+        node = trie
+        for char in literal:
+            node = node.setdefault(char, {})
+        node[''] = True
+    return re.compile('(?=(' + longestTrieRegex(trie) + '))')
+
+
+def longestTrieRegex(node):
+    branches = []
+    for char in sorted(node):
+        if char:
+            branches.append(re.escape(char) + longestTrieRegex(node[char]))
+    if not branches:
+        return ''
+    if len(branches) == 1:
+        alternation = branches[0]
+    else:
+        alternation = '(?:' + '|'.join(branches) + ')'
+    if '' in node:
+        return '(?:' + alternation + ')?'
+    return alternation
+
+
+# The rules of one direction (include or exclude) compiled into as few matchers as possible
+class RuleMatcher:
+    def __init__(self, rules):
+        self.rules = rules
+        self.keywords = {}
+        self.extensions = {}
+        # Glob and regex rules as (position, rule, match function) tuples, indexed by a literal every path they match
+        # contains.  Rules without such a literal, e.g. the glob '*', are tried on every path
+        literalRules = {}
+        self.unindexed = []
+        position = 0
+        for rule in rules:
+            if rule.kind == 'keyword':
+                self.keywords.setdefault(rule.pattern, rule)
+            elif rule.kind == 'ext':
+                for extension in rule.pattern.split(','):
+                    extension = extension.strip().lstrip('.').lower()
+                    if extension:
+                        self.extensions.setdefault(extension, rule)
+            else:
+                if rule.kind == 'glob':
+                    entry = (position, rule, re.compile(globRegex(rule.pattern)).match)
+                    literal = globLiteral(rule.pattern)
+                else:
+                    entry = (position, rule, re.compile(rule.pattern).search)
+                    literal = regexLiteral(rule.pattern)
+                position += 1
+                if literal:
+                    literalRules.setdefault(literal, []).append(entry)
+                else:
+                    self.unindexed.append(entry)
+
+        self.keywordSearch = None
+        if self.keywords:
+            self.keywordSearch = keywordRegex(self.keywords).search
+
+        # The literal regex only reports the longest literal starting at each position, so each literal is given the
+        # rules of every literal that is a prefix of it as well
+        self.literalFinder = None
+        self.candidates = {}
+        if literalRules:
+            self.literalFinder = literalRegex(literalRules).finditer
+            for literal in literalRules:
+                entries = []
+                for end in range(1, len(literal) + 1):
+                    entries.extend(literalRules.get(literal[:end], ()))
+                self.candidates[literal] = entries
+
+    # Return the first rule matching the path, or None
+    def match(self, path):
+        if self.keywordSearch:
+            found = self.keywordSearch(path)
+            if found:
+                return self.keywords[found.group(0)]
+        if self.extensions:
+            name = path[path.rfind('/') + 1:]
+            dot = name.rfind('.')
+            if dot >= 0:
+                rule = self.extensions.get(name[dot + 1:].lower())
+                if rule:
+                    return rule
+        entries = self.unindexed
+        if self.literalFinder:
+            literals = set(found.group(1) for found in self.literalFinder(path))
+            if literals:
+                entries = set(entries)
+                for literal in literals:
+                    entries.update(self.candidates[literal])
+                entries = sorted(entries)
+        for position, rule, match in entries:
+            if match(path):
+                return rule
+        return None
+
+
+# Decides which paths are kept and counts how many paths each rule matched
+class UrlFilter:
+    def __init__(self, rules=None):
+        if rules is None:
+            rules = parseRules(DEFAULT_RULES)
+        self.rules = rules
+        self.excludes = RuleMatcher([rule for rule in rules if not rule.include])
+        self.includes = RuleMatcher([rule for rule in rules if rule.include])
+        self.hasIncludes = len(self.includes.rules) > 0
+        # Paths dropped because include rules exist and none of them matched
+        self.notIncluded = 0
+
+    # True if the path should be kept.  Exclude rules win over include rules
+    def allows(self, path):
+        rule = self.excludes.match(path)
+        if rule:
+            rule.hits += 1
+            return False
+        if self.hasIncludes:
+            rule = self.includes.match(path)
+            if not rule:
+                self.notIncluded += 1
+                return False
+            rule.hits += 1
+        return True
+
+    def resetCounts(self):
+        for rule in self.rules:
+            rule.hits = 0
+        self.notIncluded = 0
+
+    # Rules with the number of paths they matched, as (rule text, hits) pairs
+    def hitCounts(self):
+        return [(str(rule), rule.hits) for rule in self.rules]